@@ -2,120 +2,399 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+import hashlib
 import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import math
+import os
+import random
+from bisect import bisect_left, insort
+from functools import lru_cache
+from itertools import groupby
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, g, has_request_context, stream_with_context, Blueprint, session, make_response, send_file, current_app, get_flashed_messages
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-import logging
-from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
 from flask_migrate import Migrate
+from werkzeug.local import LocalProxy
+from config import config
+from models import db, Genre, Venue, Artist, Show, venue_genres, artist_genres, venue_directory, directory_refresh, lookup_genres
+from assets import init_assets
+from profiling import init_profiling, query_budget
+from logs import init_logging
+from cache import make_cache, cached, StatsLogger
+from directory import DirectoryRefresher, refresh_directory
+from fragments import init_templates
+from thumbnails import ThumbnailCache, ThumbnailError
+from streaming import ndjson_chunks, csv_chunks, json_default
+from compression import CompressionMiddleware
+from importer import read_rows, batched, form_from_row, allocate_ids, write_rows
+import geo
+import seeding
 import sys
+import time
+import click
+from datetime import date, timedelta, timezone
+from sqlalchemy.exc import IntegrityError
+from flask.cli import AppGroup, with_appcontext
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
+moment = Moment()
+migrate = Migrate()
 
+# per-application caches, created in create_app()
+# resized image_link copies, see thumbnails.py
+thumbnail_cache = LocalProxy(lambda: current_app.extensions['thumbnail_cache'])
+# assembled venue/artist page payloads, see cache.py
+detail_cache = LocalProxy(lambda: current_app.extensions['detail_cache'])
+# debounced rebuilds of the /venues directory, see directory.py
+directory_refresher = LocalProxy(lambda: current_app.extensions['directory_refresher'])
+# offline city -> coordinates table, see geo.py
+gazetteer = LocalProxy(lambda: current_app.extensions['gazetteer'])
 
-migrate = Migrate(app, db)
+main = Blueprint('main', __name__)
+
+#----------------------------------------------------------------------------#
+# Form fields.
+#----------------------------------------------------------------------------#
+
+
+def venue_location(city, state):
+    # latitude/longitude/geo_cell columns of a venue in city, state; None
+    # values when the gazetteer does not list the place
+    return geo.location(gazetteer.locate(city, state))
+
+
+def venue_fields(form):
+    # column values of a validated VenueForm
+    return {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'address': form.address.data,
+        'phone': form.phone.data,
+        'genres': ",".join(form.genres.data),  # convert to list
+        'facebook_link': form.facebook_link.data,
+        'image_link': form.image_link.data,
+        'seeking_talent': form.seeking_talent.data,
+        'seeking_description': form.seeking_description.data,
+        'website': form.website_link.data,
+        **venue_location(form.city.data, form.state.data)
+    }
+
+
+def artist_fields(form):
+    # column values of a validated ArtistForm
+    return {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'phone': form.phone.data,
+        'genres': ",".join(form.genres.data),  # convert to list
+        'facebook_link': form.facebook_link.data,
+        'image_link': form.image_link.data,
+        'seeking_venue': form.seeking_venue.data,
+        'seeking_description': form.seeking_description.data,
+        'website': form.website_link.data
+    }
+
+
+# longest a show may run; bounds the overlap check in venue_conflict()
+MAX_SHOW_DURATION = timedelta(days=1)
+
+
+def show_fields(form):
+    # column values of a validated ShowForm
+    duration = min(timedelta(minutes=current_app.config['SHOW_DURATION_MINUTES']),
+                   MAX_SHOW_DURATION)
+    return {
+        'artist_id': form.artist_id.data,
+        'venue_id': form.venue_id.data,
+        'start_time': form.start_time.data,
+        'end_time': form.start_time.data + duration
+    }
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+    # compiled babel pattern and locale, parsed once per (format, locale);
+    # babel is imported on first use to keep worker boot fast
+    from babel import Locale
+    from babel.dates import parse_pattern
+    return parse_pattern(DATETIME_FORMATS.get(format, format)), Locale.parse(locale)
+
+
+def get_locale():
+    # best Accept-Language match for the current request, else the default
+    if not has_request_context():
+        return current_app.config['DEFAULT_LOCALE']
+    if 'locale' not in g:
+        g.locale = request.accept_languages.best_match(
+            current_app.config['LOCALES'], default=current_app.config['DEFAULT_LOCALE'])
+    return g.locale
+
+
+def format_datetime(value, format='medium', locale=None):
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            import dateutil.parser
+            value = dateutil.parser.parse(value)
+    pattern, locale = datetime_pattern(format, locale or get_locale())
+    return pattern.apply(value, locale)
+
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+
+def show_foreign_key(model):
+    return Show.venue_id if model is Venue else Show.artist_id
+
+
+def count_new_show(show):
+    # bump the venue and artist counters in the show's transaction
+    column = 'upcoming_shows_count' if show.start_time > datetime.now() else 'past_shows_count'
+    for model, owner_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+        model.query.filter(model.id == owner_id).update(
+            {column: getattr(model, column) + 1}, synchronize_session=False)
+
+
+def refresh_show_counts(model, ids=None):
+    """Recompute the stored counters of `model` from Shows in one UPDATE.
+
+    Limited to `ids` when given, otherwise every row is recomputed.
+    """
+    if ids is not None and not ids:
+        return
+    now = datetime.now()
+    show_fk = show_foreign_key(model)
+
+    def count(condition):
+        return db.select([db.func.count(Show.id)]).where(
+            db.and_(show_fk == model.id, condition)).as_scalar()
+
+    update = model.__table__.update().values(
+        upcoming_shows_count=count(Show.start_time > now),
+        past_shows_count=count(Show.start_time <= now))
+    if ids is not None:
+        update = update.where(model.id.in_(ids))
+    db.session.execute(update)
+
+
+def rollover_show_counts(since):
+    # shows that started after `since` have moved from upcoming to past;
+    # recompute the owners of those shows only
+    window = db.and_(Show.start_time > since, Show.start_time <= datetime.now())
+    refreshed = {}
+    for model in (Venue, Artist):
+        show_fk = show_foreign_key(model)
+        ids = [row[0] for row in db.session.query(show_fk).filter(window).distinct()]
+        refresh_show_counts(model, ids)
+        refreshed[model.__tablename__] = len(ids)
+    return refreshed
+
+
+def show_count_drift(model):
+    # rows whose stored counters differ from the Shows table
+    now = datetime.now()
+    show_fk = show_foreign_key(model)
+    actual = db.session.query(
+        show_fk.label('owner_id'),
+        db.func.sum(db.case([(Show.start_time > now, 1)], else_=0)).label('upcoming'),
+        db.func.sum(db.case([(Show.start_time <= now, 1)], else_=0)).label('past')
+    ).group_by(show_fk).subquery()
+    upcoming = db.func.coalesce(actual.c.upcoming, 0)
+    past = db.func.coalesce(actual.c.past, 0)
+    return db.session.query(
+        model.id, model.upcoming_shows_count, upcoming, model.past_shows_count, past
+    ).outerjoin(actual, actual.c.owner_id == model.id).filter(db.or_(
+        model.upcoming_shows_count != upcoming,
+        model.past_shows_count != past
+    )).all()
 
-# TODO: connect to a local postgresql database
 
 #----------------------------------------------------------------------------#
-# Models.
+# Search.
 #----------------------------------------------------------------------------#
 
 
-class Venue(db.Model):
-    __tablename__ = 'Venue'
+def search_document(model):
+    # name, city and genres as one string; must stay identical to the
+    # expression the trigram index in migration 3c1f5e0b7d24 is built on
+    space = db.literal_column("' '")
+    return model.name + space + model.city + space + model.genres
+
+
+def fts_match_term(search_term):
+    # FTS5 trigram query for a substring search: one quoted phrase
+    return '"' + search_term.replace('"', '""') + '"'
+
+
+def search_query(model, search_term, limit, dialect):
+    """Ranked search over name, city and genres of venues or artists.
+
+    Uses the pg_trgm GIN index on Postgres and the FTS5 trigram table on
+    SQLite. Rows come back as (id, name, num_upcoming_shows), best match
+    first, with the upcoming count read from the stored counter.
+    """
+    query = db.session.query(
+        model.id,
+        model.name,
+        model.upcoming_shows_count.label('num_upcoming_shows')
+    )
+
+    if dialect == 'postgresql':
+        document = search_document(model)
+        rank = db.func.word_similarity(search_term, document)
+        # ILIKE keeps plain substring matches, <% adds fuzzy word matches;
+        # both are answered by the gin_trgm_ops index
+        query = query.filter(db.or_(
+            document.ilike(f'%{search_term}%'),
+            db.literal(search_term).op('<%')(document)
+        )).order_by(rank.desc(), model.name)
+    elif dialect == 'sqlite' and len(search_term) >= 3:
+        fts = db.table(f'{model.__tablename__}_search',
+                       db.column('rowid'), db.column('rank'))
+        query = query.join(fts, fts.c.rowid == model.id).filter(
+            db.literal_column(f'"{fts.name}"').op('MATCH')(
+                fts_match_term(search_term))
+        ).order_by(fts.c.rank)
+    else:
+        # trigram search needs at least three characters
+        query = query.filter(
+            search_document(model).ilike(f'%{search_term}%')
+        ).order_by(model.name)
+
+    return query.limit(limit)
+
+
+def search_records(model, search_term, limit):
+    return search_query(model, search_term, limit, db.engine.dialect.name).all()
+
+
+def search_limit(values):
+    # ?limit= (or the form's) bounded by SEARCH_MAX_RESULTS
+    limit = min(values.get('limit', current_app.config['SEARCH_RESULTS_LIMIT'], type=int),
+                current_app.config['SEARCH_MAX_RESULTS'])
+    if limit < 1:
+        abort(400)
+    return limit
 
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String, nullable=False)
-    city = db.Column(db.String(120), nullable=False)
-    state = db.Column(db.String(120), nullable=False)
-    address = db.Column(db.String(120), nullable=False)
-    phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120), nullable=False)
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    website = db.Column(db.String(120))
-    seeking_talent = db.Column(db.Boolean, default=False, nullable=False)
-    seeking_description = db.Column(db.String(500))
-    shows = db.relationship('Show', backref='venues',
-                            lazy=False, cascade="all, delete-orphan")
 
-    def __repr__(self):
-        return f"<Venue ID {self.id}, {self.name}, {self.city}>"
+def search_response(model, search_term, limit):
+    return search_payload(search_records(model, search_term, limit))
 
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
+def search_payload(results):
+    # {'count', 'data'} as rendered by the search pages
+    response = {
+        'count': len(results),
+        'data': []
+    }
+
+    for result in results:
+        response['data'].append({
+            'id': result.id,
+            'name': result.name,
+            'num_upcoming_shows': result.num_upcoming_shows
+        })
 
-class Artist(db.Model):
-    __tablename__ = 'Artist'
+    return response
 
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String, nullable=False)
-    city = db.Column(db.String(120), nullable=False)
-    state = db.Column(db.String(120), nullable=False)
-    phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120), nullable=False)
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    website = db.Column(db.String(120))
-    seeking_venue = db.Column(db.Boolean, default=False, nullable=False)
-    seeking_description = db.Column(db.String(500))
-    shows = db.relationship('Show', backref='artists',
-                            lazy=False, cascade="all, delete-orphan")
 
-    def __repr__(self):
-        return f"<Venue ID {self.id}, {self.name}, {self.city}>"
+#----------------------------------------------------------------------------#
+# Invalidation.
+#----------------------------------------------------------------------------#
 
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
-# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+def related_ids(model, owner_id):
+    # the artists who played at a venue, or the venues an artist played at
+    other_fk = Show.artist_id if model is Venue else Show.venue_id
+    return [row[0] for row in db.session.query(other_fk).filter(
+        show_foreign_key(model) == owner_id).distinct()]
 
 
-class Show(db.Model):
-    __tablename__ = 'Shows'
+def detail_key(model, owner_id, last_modified):
+    # detail pages are cached per version: an edit, a new show or touch()
+    # moves updated_at, so a stale page is never served under a fresh
+    # Last-Modified and writes need not delete anything
+    return f'{model.__tablename__.lower()}:{owner_id}:{last_modified.isoformat()}'
+
+
+def touch(model, ids):
+    # bump updated_at of records whose pages show the edited record
+    if ids:
+        model.query.filter(model.id.in_(ids)).update(
+            {model.updated_at: datetime.utcnow()}, synchronize_session=False)
 
-    id = db.Column(db.Integer, primary_key=True)
-    start_time = db.Column(db.DateTime, nullable=False,
-                           default=datetime.utcnow)
-    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
-    artist_id = db.Column(db.Integer, db.ForeignKey(
-        'Artist.id'), nullable=False)
 
-    def __repr__(self):
-        return f"<Show ID {self.id}, {self.venue_id}, {self.artist_id}>"
 #----------------------------------------------------------------------------#
-# Filters.
+# Conditional responses.
 #----------------------------------------------------------------------------#
 
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en')
+def not_modified_since(last_modified):
+    # True when the client's If-Modified-Since copy is still current; never
+    # while a flash message is pending, since it would be lost in a 304
+    since = request.if_modified_since
+    if since is None or '_flashes' in session:
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    # HTTP dates have one second resolution
+    return last_modified.replace(microsecond=0) <= since
+
 
+def with_last_modified(body, last_modified):
+    response = make_response(body)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Language')
+    return response
+
+
+def not_modified_response(last_modified):
+    return with_last_modified(Response(status=304), last_modified)
+
+
+#----------------------------------------------------------------------------#
+# Streamed pages.
+#----------------------------------------------------------------------------#
+
+
+def stream_page(template_name, **context):
+    """render_template() as a streamed response: the page is sent in chunks
+    of TEMPLATE_STREAM_BUFFER output events while Jinja renders it, so
+    lazily iterated rows in `context` are never all in memory at once."""
+    # take the flashed messages now; the session cookie is written before
+    # the body is generated
+    get_flashed_messages()
+    app = current_app._get_current_object()
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(app.config['TEMPLATE_STREAM_BUFFER'])
+    return Response(stream_with_context(stream), mimetype='text/html')
 
-app.jinja_env.filters['datetime'] = format_datetime
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
 
-@app.route('/')
+@main.route('/')
 def index():
     return render_template('pages/home.html')
 
@@ -123,93 +402,111 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
-def venues():
-    # TODO: replace with real venues data.
-    #       num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
+def venue_rows_query(genre=None):
+    # one scan of the VenueDirectory read model in index order; it trails
+    # writes by up to DIRECTORY_REFRESH_DELAY, see directory.py
+    directory = venue_directory.c
+    query = db.session.query(
+        directory.city,
+        directory.state,
+        directory.venue_id.label('id'),
+        directory.name,
+        directory.num_upcoming_shows
+    )
 
-    data = []
-    results = Venue.query.distinct(Venue.city, Venue.state).all()
-    print(results)
+    if genre:
+        query = query.filter(directory.venue_id.in_(
+            db.session.query(venue_genres.c.venue_id)
+            .join(Genre, Genre.id == venue_genres.c.genre_id)
+            .filter(Genre.name == genre)))
 
-    for result in results:
-        venue_obj = {
-            'city': result.city,
-            'state': result.state
-        }
+    return query.order_by(directory.state, directory.city, directory.venue_id)
 
-        venue_names = []
 
-        venues = Venue.query.filter_by(
-            city=result.city, state=result.state).all()
+def venue_rows(genre=None):
+    return venue_rows_query(genre).all()
+
+
+def directory_version_query():
+    # when VenueDirectory was last rebuilt; /venues only changes then
+    return db.session.query(directory_refresh.c.refreshed_at)
 
-        for venue in venues:
-            venue_names.append({
-                'id': venue.id,
-                'name': venue.name,
-                "num_new_shows": len(list(filter(lambda x: x.start_time > datetime.now(), venue.shows)))
-            })
 
-        venue_obj['venues'] = venue_names
+def venue_areas(results):
+    # venue rows grouped by (city, state), in the order of venue_rows_query
+    data = []
+
+    for (city, state), rows in groupby(results, key=lambda row: (row.city, row.state)):
+        data.append({
+            'city': city,
+            'state': state,
+            'venues': [{
+                'id': row.id,
+                'name': row.name,
+                'num_upcoming_shows': row.num_upcoming_shows
+            } for row in rows]
+        })
 
-        data.append(venue_obj)
+    return data
 
-    return render_template('pages/venues.html', areas=data)
 
+@main.route('/venues')
+@query_budget(2)
+def venues():
+    # TODO: replace with real venues data.
+    #       num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
+    genre = request.args.get('genre')
+    version = directory_version_query().scalar()
+    data = venue_areas(venue_rows(genre))
+
+    return render_template('pages/venues.html', areas=data, genre=genre, version=version)
 
-@app.route('/venues/search', methods=['POST'])
+
+@main.route('/venues/search', methods=['POST'])
+@query_budget(1)
 def search_venues():
     # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
 
-    search_term = request.form.get('search_term')
+    search_term = request.form.get('search_term', '')
+    limit = search_limit(request.form)
 
-    response = {}
-    response['data'] = []
+    response = search_response(Venue, search_term, limit)
 
-    venues = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).all()
-    response['count'] = len(venues)
+    return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
-    for venue in venues:
-        data_obj = {
-            'id': venue.id,
-            'name': venue.name,
-            'num_upcoming_shows': len(list(filter(lambda show: show.start_time > datetime.now(), venue.shows)))
-        }
-        response['data'].append(data_obj)
-    return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
+def venue_shows_query(venue_id):
+    # every show of the venue with its artist in one joined query, split
+    # into past/upcoming by the database
+    return db.session.query(
+        Show.start_time,
+        Artist.id.label('artist_id'),
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        (Show.start_time > datetime.now()).label('upcoming')
+    ).join(Show.artists).filter(
+        Show.venue_id == venue_id
+    ).order_by(Show.start_time)
 
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-    # shows the venue page with the given venue_id
-    # TODO: replace with real venue data from the venues table, using venue_id
+
+def venue_page_data(venue_id):
+    # assembles the show_venue payload, None if there is no such venue
     venue = Venue.query.get(venue_id)
-    print(venue)
+    if venue is None:
+        return None
+    return venue_payload(venue, venue_shows_query(venue_id).all())
 
-    old_shows = list(filter(lambda show: show.start_time <
-                     datetime.now(), venue.shows))
 
+def venue_payload(venue, shows):
     pastshows = []
-
-    for show in old_shows:
-        pastshows.append({
-            'artist_id': show.artists.id,
-            'artist_name': show.artists.name,
-            'artist_image_link': show.artists.image_link,
-            'start_time': format_datetime(str(show.start_time))
-        })
-
-    upcoming_shows = list(
-        filter(lambda show: show.start_time > datetime.now(), venue.shows))
-
     newshows = []
 
-    for show in upcoming_shows:
-        newshows.append({
-            'artist_id': show.artists.id,
-            'artist_name': show.artists.name,
-            'artist_image_link': show.artists.image_link,
-            'start_time': format_datetime(str(show.start_time))
+    for show in shows:
+        (newshows if show.upcoming else pastshows).append({
+            'artist_id': show.artist_id,
+            'artist_name': show.artist_name,
+            'artist_image_link': show.artist_image_link,
+            'start_time': show.start_time
         })
 
     data = {
@@ -231,19 +528,39 @@ def show_venue(venue_id):
         "upcoming_shows_count": len(newshows),
     }
 
-    return render_template('pages/show_venue.html', venue=data)
+    return data
+
+
+@main.route('/venues/<int:venue_id>')
+@query_budget(3)
+def show_venue(venue_id):
+    # shows the venue page with the given venue_id
+    last_modified = db.session.query(Venue.updated_at).filter(
+        Venue.id == venue_id).scalar()
+    if last_modified is None:
+        abort(404)
+    if not_modified_since(last_modified):
+        return not_modified_response(last_modified)
+
+    data = cached(detail_cache, detail_key(Venue, venue_id, last_modified),
+                  lambda: venue_page_data(venue_id))
+    if data is None:
+        abort(404)
+
+    return with_last_modified(
+        render_template('pages/show_venue.html', venue=data), last_modified)
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
 
-@app.route('/venues/create', methods=['GET'])
+@main.route('/venues/create', methods=['GET'])
 def create_venue_form():
     form = VenueForm()
     return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@main.route('/venues/create', methods=['POST'])
 def create_venue_submission():
     # TODO: insert form data as a new Venue record in the db, instead
     # TODO: modify data to be the data object returned from db insertion
@@ -253,22 +570,14 @@ def create_venue_submission():
 
         try:
             new_venue = Venue(
-                name=form.name.data,
-                city=form.city.data,
-                state=form.state.data,
-                address=form.address.data,
-                phone=form.phone.data,
-                genres=",".join(form.genres.data),  # convert to list
-                facebook_link=form.facebook_link.data,
-                image_link=form.image_link.data,
-                seeking_talent=form.seeking_talent.data,
-                seeking_description=form.seeking_description.data,
-                website=form.website_link.data
+                **venue_fields(form),
+                genre_tags=lookup_genres(form.genres.data)
             )
 
             # add to the database
             db.session.add(new_venue)
             db.session.commit()
+            directory_refresher.schedule()
             # on successful db insert, flash success
             flash(
                 'Venue ' + request.form['name'] + ' was successfully listed!')
@@ -278,35 +587,40 @@ def create_venue_submission():
             db.session.rollback()
             flash('An error occurred. Venue ' +
                   request.form['name'] + ' could not be listed.')
-            print(sys.exc_info())
+            current_app.logger.exception('venue could not be listed')
         finally:
             db.session.close()
     else:
-        print(" ", form.errors)
+        current_app.logger.info('invalid venue form', extra={'errors': form.errors})
         flash("An error occured. Venue" +
               request.form['name'] + "could not be listed")
 
     return render_template('pages/home.html')
 
 
-@app.route('/venues/<venue_id>/delete', methods=['GET'])
+@main.route('/venues/<venue_id>/delete', methods=['GET'])
 def delete_venue(venue_id):
     # TODO: Complete this endpoint for taking a venue_id, and using
     # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
     try:
         venue = Venue.query.get(venue_id)
         # venuename = venue['name']
+        artist_ids = related_ids(Venue, venue_id)
         db.session.delete(venue)
+        # the venue's shows are gone with it; recount (and so touch) their artists
+        db.session.flush()
+        refresh_show_counts(Artist, artist_ids)
         db.session.commit()
+        directory_refresher.schedule()
 
         flash('Venue' + venue.name + 'was successfully deleted!')
     except:
         db.session.rollback()
-        print(sys.exe_info())
+        current_app.logger.exception('venue %s could not be deleted', venue_id)
         flash("Venue was not successfully deleted")
     finally:
         db.session.close()
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
     # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
     # clicking that button delete it from the db then redirect the user to the homepage
 
@@ -315,81 +629,78 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 
 
-@app.route('/artists')
-def artists():
-    # TODO: replace with real data returned from querying the database
-    data = []
+def artist_rows_query(genre=None):
+    query = db.session.query(Artist.id, Artist.name)
 
-    artists = Artist.query.all()
+    if genre:
+        query = query.filter(Artist.genre_tags.any(Genre.name == genre))
+
+    return query.order_by(Artist.id)
 
-    for artist in artists:
-        data.append({
-            'id': artist.id,
-            "name": artist.name
-        })
 
-    return render_template('pages/artists.html', artists=data)
+def artist_rows(genre=None):
+    return artist_rows_query(genre).all()
 
 
-@app.route('/artists/search', methods=['POST'])
+@main.route('/artists')
+@query_budget(2)
+def artists():
+    # streamed: rows are fetched in EXPORT_BATCH_SIZE batches as the page
+    # renders, so a pooled connection and its transaction stay checked out
+    # until the client has the whole page
+    genre = request.args.get('genre')
+    version = table_versions(Artist)
+    data = artist_rows_query(genre).yield_per(current_app.config['EXPORT_BATCH_SIZE'])
+
+    return stream_page('pages/artists.html', artists=data, genre=genre, version=version)
+
+
+@main.route('/artists/search', methods=['POST'])
+@query_budget(1)
 def search_artists():
     # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
     # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
     # search for "band" should return "The Wild Sax Band".
-    search_term = request.form.get('search_term')
-
-    artists = Artist.query.filter(Artist.name.ilike(f"%{search_term}%")).all()
+    search_term = request.form.get('search_term', '')
+    limit = search_limit(request.form)
 
-    response = {
-        'count': len(artists),
-        'data': []
-    }
+    response = search_response(Artist, search_term, limit)
 
-    for artist in artists:
+    return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
-        data_obj = {
-            'id': artist.id,
-            'name': artist.name,
-            'num_upcoming_shows': len(list(filter(lambda show: show.start_time > datetime.now(), artist.shows)))
-        }
 
-        response['data'].append(data_obj)
-    return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+def artist_shows_query(artist_id):
+    # every show of the artist with its venue in one joined query, split
+    # into past/upcoming by the database
+    return db.session.query(
+        Show.start_time,
+        Venue.id.label('venue_id'),
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link'),
+        (Show.start_time > datetime.now()).label('upcoming')
+    ).join(Show.venues).filter(
+        Show.artist_id == artist_id
+    ).order_by(Show.start_time)
 
 
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-    # shows the artist page with the given artist_id
-    # TODO: replace with real artist data from the artist table, using artist_id
+def artist_page_data(artist_id):
+    # assembles the show_artist payload, None if there is no such artist
     artist = Artist.query.get(artist_id)
-    # artist['genres'] = artist.genres.split(",")
+    if artist is None:
+        return None
+    return artist_payload(artist, artist_shows_query(artist_id).all())
 
-    # upcoming shows
-    upcoming_shows = list(
-        filter(lambda show: show.start_time > datetime.now(), artist.shows))
 
-    # upcomingshows(no)
+def artist_payload(artist, shows):
     upcoming = []
-
-    for show in upcoming_shows:
-        upcoming.append({
-            'venue_id': show.venue_id,
-            'venue_name': Venue.query.filter_by(id=show.venue_id).first().name,
-            'venue_image_link': Venue.query.filter_by(id=show.venue_id).first().image_link,
-            'start_time': format_datetime(str(show.start_time))
-        })
-
-    # pastshows(NO)
-    past_shows = list(filter(lambda show: show.start_time <
-                      datetime.now(), artist.shows))
-
     past = []
-    for show in past_shows:
-        past.append({
+
+    for show in shows:
+        (upcoming if show.upcoming else past).append({
             'venue_id': show.venue_id,
-            'venue_name': Venue.query.filter_by(id=show.venue_id).first().name,
-            'venue_image_link': Venue.query.filter_by(id=show.venue_id).first().image_link,
-            'start_time': format_datetime(str(show.start_time))
+            'venue_name': show.venue_name,
+            'venue_image_link': show.venue_image_link,
+            'start_time': show.start_time
         })
 
     data = {
@@ -410,14 +721,34 @@ def show_artist(artist_id):
         "upcoming_shows_count": len(upcoming),
     }
 
-    print(data)
-    return render_template('pages/show_artist.html', artist=data)
+    return data
+
+
+@main.route('/artists/<int:artist_id>')
+@query_budget(3)
+def show_artist(artist_id):
+    # shows the artist page with the given artist_id
+    last_modified = db.session.query(Artist.updated_at).filter(
+        Artist.id == artist_id).scalar()
+    if last_modified is None:
+        abort(404)
+    if not_modified_since(last_modified):
+        return not_modified_response(last_modified)
+
+    data = cached(detail_cache, detail_key(Artist, artist_id, last_modified),
+                  lambda: artist_page_data(artist_id))
+    if data is None:
+        abort(404)
+
+    current_app.logger.debug('artist page', extra={'artist_id': artist_id})
+    return with_last_modified(
+        render_template('pages/show_artist.html', artist=data), last_modified)
 
 #  Update
 #  ----------------------------------------------------------------
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
     form = ArtistForm()
 
@@ -439,7 +770,7 @@ def edit_artist(artist_id):
     return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
     # TODO: take values from the form submitted, and update existing
     # artist record with ID <artist_id> using the new attributes
@@ -450,19 +781,22 @@ def edit_artist_submission(artist_id):
         try:
             artist = Artist.query.get(artist_id)
 
-            artist.name = form.name.data,
-            artist.city = form.city.data,
-            artist.state = form.state.data,
-            artist.phone = form.phone.data,
-            artist.genres = ",".join(form.genres.data),  # convert to list
-            artist.facebook_link = form.facebook_link.data,
-            artist.image_link = form.image_link.data,
+            artist.name = form.name.data
+            artist.city = form.city.data
+            artist.state = form.state.data
+            artist.phone = form.phone.data
+            artist.genres = ",".join(form.genres.data)  # convert to list
+            artist.genre_tags = lookup_genres(form.genres.data)
+            artist.facebook_link = form.facebook_link.data
+            artist.image_link = form.image_link.data
             artist.seeking_venue = True if form.seeking_venue.data else False
-            artist.seeking_description = form.seeking_description.data,
+            artist.seeking_description = form.seeking_description.data
             artist.website = form.website_link.data
 
             # add to the database
             db.session.add(artist)
+            venue_ids = related_ids(Artist, artist_id)
+            touch(Venue, venue_ids)
             db.session.commit()
             # on successful db insert, flash success
             flash(
@@ -473,18 +807,18 @@ def edit_artist_submission(artist_id):
             db.session.rollback()
             flash('Artist ' +
                   request.form['name'] + ' could not be updated.')
-            print(sys.exc_info())
+            current_app.logger.exception('artist %s could not be updated', artist_id)
         finally:
             db.session.close()
     else:
-        print(" ", form.errors)
+        current_app.logger.info('invalid artist form', extra={'errors': form.errors})
         flash("Artist " +
               request.form['name'] + "could not be updated")
 
-    return redirect(url_for('show_artist', artist_id=artist_id))
+    return redirect(url_for('main.show_artist', artist_id=artist_id))
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
 
     form = VenueForm()
@@ -507,7 +841,7 @@ def edit_venue(venue_id):
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
     # TODO: take values from the form submitted, and update existing
     # venue record with ID <venue_id> using the new attributes
@@ -518,21 +852,28 @@ def edit_venue_submission(venue_id):
         try:
             venue = Venue.query.get(venue_id)
 
-            venue.name = form.name.data,
-            venue.city = form.city.data,
-            venue.state = form.state.data,
-            venue.address = form.address.data,
-            venue.phone = form.phone.data,
-            venue.genres = ",".join(form.genres.data),  # convert to list
-            venue.facebook_link = form.facebook_link.data,
-            venue.image_link = form.image_link.data,
+            if (venue.city, venue.state) != (form.city.data, form.state.data):
+                for key, value in venue_location(form.city.data, form.state.data).items():
+                    setattr(venue, key, value)
+            venue.name = form.name.data
+            venue.city = form.city.data
+            venue.state = form.state.data
+            venue.address = form.address.data
+            venue.phone = form.phone.data
+            venue.genres = ",".join(form.genres.data)  # convert to list
+            venue.genre_tags = lookup_genres(form.genres.data)
+            venue.facebook_link = form.facebook_link.data
+            venue.image_link = form.image_link.data
             venue.seeking_talent = True if form.seeking_talent.data else False
-            venue.seeking_description = form.seeking_description.data,
+            venue.seeking_description = form.seeking_description.data
             venue.website = form.website_link.data
 
             # add to the database
             db.session.add(venue)
+            artist_ids = related_ids(Venue, venue_id)
+            touch(Artist, artist_ids)
             db.session.commit()
+            directory_refresher.schedule()
             # on successful db insert, flash success
             flash(
                 'Venue ' + form.name.data + ' was successfully updated!')
@@ -542,27 +883,27 @@ def edit_venue_submission(venue_id):
             db.session.rollback()
             flash('Venue ' +
                   request.form['name'] + ' could not be updated.')
-            print(sys.exc_info())
+            current_app.logger.exception('venue %s could not be updated', venue_id)
         finally:
             db.session.close()
     else:
-        print(" ", form.errors)
+        current_app.logger.info('invalid venue form', extra={'errors': form.errors})
         flash("Venue" +
               request.form['name'] + "could not be updated")
 
-    return redirect(url_for('show_venue', venue_id=venue_id))
+    return redirect(url_for('main.show_venue', venue_id=venue_id))
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
 
-@app.route('/artists/create', methods=['GET'])
+@main.route('/artists/create', methods=['GET'])
 def create_artist_form():
     form = ArtistForm()
     return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@main.route('/artists/create', methods=['POST'])
 def create_artist_submission():
     # called upon submitting the new artist listing form
     # TODO: insert form data as a new Venue record in the db, instead
@@ -574,16 +915,8 @@ def create_artist_submission():
 
         try:
             new_artist = Artist(
-                name=form.name.data,
-                city=form.city.data,
-                state=form.state.data,
-                phone=form.phone.data,
-                genres=",".join(form.genres.data),  # convert to list
-                facebook_link=form.facebook_link.data,
-                image_link=form.image_link.data,
-                seeking_venue=form.seeking_venue.data,
-                seeking_description=form.seeking_description.data,
-                website=form.website_link.data
+                **artist_fields(form),
+                genre_tags=lookup_genres(form.genres.data)
             )
 
             # add to the database
@@ -598,11 +931,11 @@ def create_artist_submission():
             db.session.rollback()
             flash('An error occurred. Venue ' +
                   request.form['name'] + ' could not be listed.')
-            print(sys.exc_info())
+            current_app.logger.exception('artist could not be listed')
         finally:
             db.session.close()
     else:
-        print(" ", form.errors)
+        current_app.logger.info('invalid artist form', extra={'errors': form.errors})
         flash("An error occured. Venue" +
               request.form['name'] + "could not be listed")
 
@@ -612,36 +945,121 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+def encode_show_cursor(show):
+    # cursor for the /shows seek: "<iso start_time>_<id>" of the last row
+    return f"{show.start_time.isoformat()}_{show.id}"
+
+
+def decode_show_cursor(cursor):
+    start_time, _, show_id = cursor.rpartition('_')
+    return datetime.fromisoformat(start_time), int(show_id)
+
+
+def show_rows():
+    # the columns a show tile renders, joined in one query
+    return db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+    ).join(Show.venues).join(Show.artists)
+
+
+def show_dict(show):
+    return {
+        "id": show.id,
+        "venue_id": show.venue_id,
+        "venue_name": show.venue_name,
+        "artist_id": show.artist_id,
+        "artist_name": show.artist_name,
+        "artist_image_link": show.artist_image_link,
+        "start_time": show.start_time
+    }
+
+
+def show_page_query(after, limit, start=None, end=None):
+    """Shows after the `after` cursor, one more than `limit`, optionally
+    limited to those starting in [start, end).
+
+    Keyset pagination on (start_time, id): the cursor seeks past the last
+    show of the previous page instead of counting rows with OFFSET.
+    """
+    query = show_rows()
+
+    if start:
+        query = query.filter(Show.start_time >= start)
+    if end:
+        query = query.filter(Show.start_time < end)
+
+    if after:
+        try:
+            start_time, show_id = decode_show_cursor(after)
+        except ValueError:
+            abort(400)
+        query = query.filter(
+            db.tuple_(Show.start_time, Show.id) > (start_time, show_id))
+
+    # one extra row tells us whether there is a next page
+    return query.order_by(Show.start_time, Show.id).limit(limit + 1)
+
+
+def show_page(after, limit, start=None, end=None):
+    # one page of shows after the `after` cursor, and the next cursor
+    return show_page_result(show_page_query(after, limit, start, end).all(), limit)
+
+
+def show_page_result(shows, limit):
+    next_cursor = None
+    if len(shows) > limit:
+        shows = shows[:limit]
+        next_cursor = encode_show_cursor(shows[-1])
+
+    return [show_dict(show) for show in shows], next_cursor
+
+
+def show_page_limit():
+    # ?limit= bounded by SHOWS_MAX_PER_PAGE
+    limit = min(request.args.get('limit', current_app.config['SHOWS_PER_PAGE'], type=int),
+                current_app.config['SHOWS_MAX_PER_PAGE'])
+    if limit < 1:
+        abort(400)
+    return limit
+
+
+@main.route('/shows')
+@query_budget(2)
 def shows():
     # displays list of shows at /shows
     # TODO: replace with real venues data.
 
-    data = []
+    limit = show_page_limit()
+    start, end = date_range()
+    data, next_cursor = show_page(request.args.get('after'), limit, start, end)
 
-    shows = Show.query.all()
+    # ?bucket=day|week adds show counts per bucket of the ?from=&to= range
+    bucket = bucket_arg()
+    buckets = None
+    if bucket:
+        bounded_range(start, end)
+        rows = show_buckets_query(start, end, bucket, db.engine.dialect.name).all()
+        buckets = show_buckets(rows, start, end, bucket)
 
-    for show in shows:
-        data.append({
-            "venue_id": show.venues.id,
-            "venue_name": show.venues.name,
-            "artist_id": show.artists.id,
-            "artist_name": show.artists.name,
-            "artist_image_link": show.artists.image_link,
-            "start_time": format_datetime(str(show.start_time))
-        })
-
-    return render_template('pages/shows.html', shows=data)
+    return stream_page('pages/shows.html', shows=data, next_cursor=next_cursor, limit=limit,
+                       buckets=buckets, bucket=bucket, bucket_length=BUCKETS.get(bucket),
+                       range_from=request.args.get('from'), range_to=request.args.get('to'))
 
 
-@app.route('/shows/create')
+@main.route('/shows/create')
 def create_shows():
     # renders form. do not touch.
     form = ShowForm()
     return render_template('forms/new_show.html', form=form)
 
 
-@app.route('/shows/create', methods=['POST'])
+@main.route('/shows/create', methods=['POST'])
 def create_show_submission():
     # called to create new shows in the db, upon submitting new show listing form
     # TODO: insert form data as a new Show record in the db, instead
@@ -650,52 +1068,1050 @@ def create_show_submission():
     if form.validate():
 
         try:
-            new_show = Show(
-                artist_id=form.artist_id.data,
-                venue_id=form.venue_id.data,
-                start_time=form.start_time.data
-            )
+            fields = show_fields(form)
+            conflict = venue_conflict(fields['venue_id'], fields['start_time'], fields['end_time'])
+            if conflict is not None:
+                flash('The venue already has a show at ' +
+                      format_datetime(conflict.start_time, 'full') + '.')
+                return render_template('forms/new_show.html', form=form)
+
+            new_show = Show(**fields)
 
             # add to the database
             db.session.add(new_show)
+            count_new_show(new_show)
             db.session.commit()
+            directory_refresher.schedule()
             # on successful db insert, flash success
             flash('Show was successfully listed!')
 
+        except IntegrityError as error:
+            db.session.rollback()
+            # exclusion_violation: booked by a concurrent request since the check
+            if getattr(error.orig, 'pgcode', None) == '23P01':
+                flash('The venue was booked for that time in the meantime.')
+            else:
+                flash('Show was not successfully added')
+                current_app.logger.exception('show could not be listed')
         except Exception:
 
             db.session.rollback()
             flash('Show was not successfully added')
-            print(sys.exc_info())
+            current_app.logger.exception('show could not be listed')
         finally:
             db.session.close()
     else:
-        print(" ", form.errors)
+        current_app.logger.info('invalid show form', extra={'errors': form.errors})
         flash("An error occured. Show could not be listed")
 
     return render_template('pages/home.html')
 
 
-@app.errorhandler(404)
+#  Calendar
+#  ----------------------------------------------------------------
+
+# bucket name -> length
+BUCKETS = {'day': timedelta(days=1), 'week': timedelta(weeks=1)}
+
+
+def local_datetime(value):
+    # an ISO date or datetime as the naive local time show times are
+    # stored in; one with an offset is converted, not just stripped
+    value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def utc_datetime(value):
+    # an ISO datetime as the naive UTC that created_at/updated_at are
+    # stored in; naive values are taken as UTC already
+    value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def date_range():
+    # ?from= and ?to= as ISO dates or datetimes, `to` exclusive
+    values = []
+    for key in ('from', 'to'):
+        value = request.args.get(key)
+        try:
+            values.append(local_datetime(value) if value else None)
+        except ValueError:
+            abort(400)
+    if None not in values and values[1] <= values[0]:
+        abort(400)
+    return values
+
+
+def bounded_range(start, end):
+    # bucketed views need both ends and at most CALENDAR_MAX_DAYS between them
+    if start is None or end is None or \
+            end - start > timedelta(days=current_app.config['CALENDAR_MAX_DAYS']):
+        abort(400)
+
+
+def bucket_arg(default=None):
+    bucket = request.args.get('bucket', default)
+    if bucket is not None and bucket not in BUCKETS:
+        abort(400)
+    return bucket
+
+
+def bucket_start(value, bucket):
+    # first day of the day/week (weeks start on Monday) holding `value`
+    day = value.date() if isinstance(value, datetime) else date.fromisoformat(value)
+    return day - timedelta(days=day.weekday()) if bucket == 'week' else day
+
+
+def bucket_days(start, end, bucket):
+    # the first day of every bucket overlapping [start, end)
+    day = bucket_start(start, bucket)
+    while datetime.combine(day, datetime.min.time()) < end:
+        yield day
+        day += BUCKETS[bucket]
+
+
+def show_buckets_query(start, end, bucket, dialect):
+    # shows per day/week in [start, end), counted off the start_time index
+    if dialect == 'postgresql':
+        key = db.func.date_trunc(db.literal_column(f"'{bucket}'"), Show.start_time)
+    elif bucket == 'week':
+        key = db.func.date(Show.start_time, 'weekday 0', '-6 days')
+    else:
+        key = db.func.date(Show.start_time)
+    return db.session.query(
+        key.label('bucket'),
+        db.func.count(Show.id).label('shows')
+    ).filter(
+        Show.start_time >= start,
+        Show.start_time < end
+    ).group_by(key).order_by(key)
+
+
+def show_buckets(rows, start, end, bucket):
+    counts = {bucket_start(row.bucket, bucket): row.shows for row in rows}
+    return [{'start': day, 'shows': counts.get(day, 0)}
+            for day in bucket_days(start, end, bucket)]
+
+
+def venue_conflict(venue_id, start_time, end_time):
+    """A show at the venue overlapping [start_time, end_time), or None.
+
+    Shows run at most MAX_SHOW_DURATION, so only those starting after
+    start_time - MAX_SHOW_DURATION can overlap: a bounded range scan of
+    ix_Shows_venue_id_start_time instead of the venue's whole history.
+    """
+    return db.session.query(Show.id, Show.start_time).filter(
+        Show.venue_id == venue_id,
+        Show.start_time > start_time - MAX_SHOW_DURATION,
+        Show.start_time < end_time,
+        Show.end_time > start_time
+    ).first()
+
+
+def calendar_range():
+    # ?from=&to=, by default the current month, or the month from ?from=
+    start, end = date_range()
+    if start is None:
+        start = datetime.combine(date.today().replace(day=1), datetime.min.time())
+    if end is None:
+        end = datetime.combine((start.replace(day=1) + timedelta(days=32)).replace(day=1),
+                               datetime.min.time())
+    bounded_range(start, end)
+    return start, end
+
+
+def venue_calendar_query(venue_id, start, end):
+    # the venue's shows overlapping [start, end), including one that began
+    # before `start`; bounded like venue_conflict() to a range scan of
+    # ix_Shows_venue_id_start_time
+    return db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.end_time,
+        Artist.id.label('artist_id'),
+        Artist.name.label('artist_name')
+    ).join(Show.artists).filter(
+        Show.venue_id == venue_id,
+        Show.start_time > start - MAX_SHOW_DURATION,
+        Show.end_time > start,
+        Show.start_time < end
+    ).order_by(Show.start_time)
+
+
+def calendar_payload(venue, shows, start, end, bucket):
+    days = {day: [] for day in bucket_days(start, end, bucket)}
+    for show in shows:
+        entry = {
+            'id': show.id,
+            'start_time': show.start_time,
+            'end_time': show.end_time,
+            'artist_id': show.artist_id,
+            'artist_name': show.artist_name
+        }
+        # listed on every day/week of the range the show runs into
+        day = bucket_start(max(show.start_time, start), bucket)
+        while datetime.combine(day, datetime.min.time()) < min(show.end_time, end):
+            days[day].append(entry)
+            day += BUCKETS[bucket]
+    return {
+        'id': venue.id,
+        'name': venue.name,
+        'from': start,
+        'to': end,
+        'bucket': bucket,
+        'data': [{'start': day, 'shows': day_shows, 'free': not day_shows}
+                 for day, day_shows in days.items()]
+    }
+
+
+def venue_calendar_data(venue_id):
+    venue = db.session.query(Venue.id, Venue.name).filter(Venue.id == venue_id).first()
+    if venue is None:
+        abort(404)
+    start, end = calendar_range()
+    bucket = bucket_arg('day')
+    shows = venue_calendar_query(venue_id, start, end).all()
+    return calendar_payload(venue, shows, start, end, bucket)
+
+
+def adjacent_ranges(start, end):
+    # (from, to) of the equally long ranges before and after [start, end)
+    span = end - start
+    return (start - span, start), (end, end + span)
+
+
+@main.route('/venues/<int:venue_id>/calendar')
+@query_budget(2)
+def venue_calendar(venue_id):
+    # a venue's shows by day or week, free days included
+    calendar = venue_calendar_data(venue_id)
+    previous, following = adjacent_ranges(calendar['from'], calendar['to'])
+    return render_template('pages/venue_calendar.html', calendar=calendar,
+                           previous=previous, following=following)
+
+
+#  Nearby venues
+#  ----------------------------------------------------------------
+
+def nearby_args():
+    # ?lat=&lng= in degrees and ?radius= in miles, None without a point
+    values = {}
+    limits = {'lat': 90, 'lng': 180, 'radius': current_app.config['NEARBY_MAX_RADIUS']}
+    for key, limit in limits.items():
+        value = request.args.get(key)
+        if not value:
+            continue
+        try:
+            values[key] = float(value)
+        except ValueError:
+            abort(400)
+        # also rejects nan
+        if not -limit <= values[key] <= limit or key == 'radius' and values[key] < 0:
+            abort(400)
+    if 'lat' not in values and 'lng' not in values:
+        return None
+    if 'lat' not in values or 'lng' not in values:
+        abort(400)
+    return values['lat'], values['lng'], values.get('radius', current_app.config['NEARBY_RADIUS'])
+
+
+def postgis_enabled():
+    # whether migration a4d8c1f3b9e2 built the PostGIS index; looked up
+    # once per process
+    if 'postgis' not in current_app.extensions:
+        current_app.extensions['postgis'] = db.engine.dialect.name == 'postgresql' and \
+            db.session.execute(db.text(
+                """SELECT to_regclass('"ix_Venue_geography"')""")).scalar() is not None
+    return current_app.extensions['postgis']
+
+
+def geography(longitude, latitude):
+    # the expression ix_Venue_geography is built on
+    return db.func.geography(db.func.ST_SetSRID(db.func.ST_MakePoint(longitude, latitude), 4326))
+
+
+def nearby_query(latitude, longitude, radius, limit, postgis=False):
+    """Located venues within about `radius` miles, nearest first.
+
+    With PostGIS this is a KNN scan of ix_Venue_geography. Otherwise it is
+    a range scan of ix_Venue_geo_cell per grid row of the bounding box,
+    ordered by equirectangular distance, which at these radii is within a
+    fraction of a percent of the great circle one; nearby_payload()
+    applies the exact radius.
+    """
+    query = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.address,
+        Venue.latitude,
+        Venue.longitude,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    )
+
+    if postgis:
+        venue_point = geography(Venue.longitude, Venue.latitude)
+        point = geography(longitude, latitude)
+        return query.filter(
+            db.func.ST_DWithin(venue_point, point, radius * geo.METERS_PER_MILE)
+        ).order_by(venue_point.op('<->')(point)).limit(limit)
+
+    south, north, west, east = geo.bounding_box(latitude, longitude, radius)
+    venue_longitude = Venue.longitude
+    if west > east:
+        # the box crosses the antimeridian; measure on the point's side
+        if longitude > 0:
+            venue_longitude = db.case([(Venue.longitude < 0, Venue.longitude + 360)],
+                                      else_=Venue.longitude)
+        else:
+            venue_longitude = db.case([(Venue.longitude > 0, Venue.longitude - 360)],
+                                      else_=Venue.longitude)
+    scale = math.cos(math.radians(latitude))
+    north_south = Venue.latitude - latitude
+    east_west = (venue_longitude - longitude) * scale
+
+    return query.filter(db.or_(*[
+        Venue.geo_cell.between(first, last)
+        for first, last in geo.cell_ranges(south, north, west, east)
+    ])).order_by(north_south * north_south + east_west * east_west).limit(limit)
+
+
+def nearby_payload(rows, latitude, longitude, radius):
+    data = []
+    for row in rows:
+        distance = geo.distance_miles(latitude, longitude, row.latitude, row.longitude)
+        if distance <= radius:
+            data.append({
+                'id': row.id,
+                'name': row.name,
+                'city': row.city,
+                'state': row.state,
+                'address': row.address,
+                'latitude': row.latitude,
+                'longitude': row.longitude,
+                'distance': round(distance, 2),
+                'num_upcoming_shows': row.num_upcoming_shows
+            })
+    data.sort(key=lambda venue: venue['distance'])
+    return {
+        'latitude': latitude,
+        'longitude': longitude,
+        'radius': radius,
+        'count': len(data),
+        'data': data
+    }
+
+
+def nearby_data():
+    args = nearby_args()
+    if args is None:
+        return None
+    latitude, longitude, radius = args
+    rows = nearby_query(latitude, longitude, radius, current_app.config['NEARBY_RESULTS_LIMIT'],
+                        postgis_enabled()).all()
+    return nearby_payload(rows, latitude, longitude, radius)
+
+
+@main.route('/venues/nearby')
+@query_budget(2)
+def nearby_venues():
+    # venues within ?radius= miles of ?lat=&lng=, nearest first; only the
+    # search form without a point
+    return render_template('pages/nearby_venues.html', results=nearby_data())
+
+
+#  Images
+#  ----------------------------------------------------------------
+
+IMAGE_MODELS = {'venues': Venue, 'artists': Artist}
+
+
+def image_version(image_link):
+    return hashlib.sha256(image_link.encode('utf-8')).hexdigest()[:8]
+
+
+def thumbnail_url(kind, record_id, size, image_link):
+    # ?v= changes with the source url, so responses can be cached for good
+    return url_for('main.thumbnail', kind=kind, record_id=record_id, size=size,
+                   v=image_version(image_link))
+
+
+
+@main.route('/img/<any(venues, artists):kind>/<int:record_id>/<size>')
+@query_budget(1)
+def thumbnail(kind, record_id, size):
+    # resized copy of a venue/artist image_link, fetched once and kept in
+    # the on-disk thumbnail cache
+    width = current_app.config['THUMBNAIL_SIZES'].get(size)
+    if width is None:
+        abort(404)
+    model = IMAGE_MODELS[kind]
+    image_link = db.session.query(model.image_link).filter(
+        model.id == record_id).scalar()
+    if not image_link:
+        abort(404)
+
+    if not thumbnail_cache.available:
+        # pages link image_link directly then; never redirect to user urls
+        abort(404)
+
+    format = 'webp' if request.accept_mimetypes['image/webp'] else 'jpeg'
+    try:
+        path = thumbnail_cache.thumbnail(image_link, width, format)
+    except ThumbnailError:
+        current_app.logger.warning('thumbnail failed for %s', image_link, exc_info=True)
+        abort(404)
+
+    response = send_file(path, mimetype=f'image/{format}')
+    response.vary.add('Accept')
+    if request.args.get('v') == image_version(image_link):
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+EXPORT_COLUMNS = {
+    'venues': (Venue, ['id', 'name', 'city', 'state', 'address', 'phone', 'genres',
+                       'image_link', 'facebook_link', 'website', 'seeking_talent',
+                       'seeking_description', 'upcoming_shows_count', 'past_shows_count',
+                       'updated_at']),
+    'artists': (Artist, ['id', 'name', 'city', 'state', 'phone', 'genres', 'image_link',
+                         'facebook_link', 'website', 'seeking_venue', 'seeking_description',
+                         'upcoming_shows_count', 'past_shows_count', 'updated_at']),
+    'shows': (Show, ['id', 'start_time', 'venue_id', 'artist_id', 'updated_at']),
+}
+
+
+@main.route('/export/<any(venues, artists, shows):kind>')
+def export(kind):
+    # streams a whole table as NDJSON (default) or CSV (?format=csv);
+    # ?since=<ISO datetime> only exports rows changed at or after then, in
+    # updated_at order. ?after_id=<id> breaks ties: with since= it resumes
+    # after the last (updated_at, id) exported, alone it exports rows
+    # added after that id
+    model, columns = EXPORT_COLUMNS[kind]
+    output = request.args.get('format', 'ndjson')
+    if output not in ('ndjson', 'csv'):
+        abort(400)
+    since = request.args.get('since')
+    if since:
+        try:
+            since = utc_datetime(since)
+        except ValueError:
+            abort(400)
+    after_id = request.args.get('after_id', type=int)
+
+    # plain column tuples, streamed from a server-side cursor in
+    # EXPORT_BATCH_SIZE rows so memory stays flat
+    query = db.session.query(*[getattr(model, column) for column in columns])
+    if since:
+        # walks ix_<table>_updated_at_id
+        if after_id is not None:
+            query = query.filter(db.or_(
+                model.updated_at > since,
+                db.and_(model.updated_at == since, model.id > after_id)))
+        else:
+            query = query.filter(model.updated_at >= since)
+        query = query.order_by(model.updated_at, model.id)
+    else:
+        if after_id is not None:
+            query = query.filter(model.id > after_id)
+        query = query.order_by(model.id)
+    rows = query.yield_per(current_app.config['EXPORT_BATCH_SIZE'])
+
+    if output == 'csv':
+        body, mimetype = csv_chunks(columns, rows), 'text/csv'
+    else:
+        body, mimetype = ndjson_chunks(columns, rows), 'application/x-ndjson'
+
+    # compressed on the way out by CompressionMiddleware
+    headers = {'Content-Disposition': f'attachment; filename={kind}.{output}'}
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+
+#----------------------------------------------------------------------------#
+# API.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def select_fields(resource, fields):
+    return {key: value for key, value in resource.items() if key in fields}
+
+
+def api_response(payload, etag=None):
+    """JSON response with a strong ETag, over its body unless given.
+
+    ?fields=a,b keeps only those keys of each resource (the items of
+    `data` for lists). A matching If-None-Match gets a bodiless 304.
+    """
+    fields = request.args.get('fields')
+    if fields:
+        fields = set(fields.split(','))
+        if 'data' in payload:
+            payload = dict(payload, data=[select_fields(item, fields) for item in payload['data']])
+        else:
+            payload = select_fields(payload, fields)
+
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=json_default)
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag or hashlib.sha256(body.encode('utf-8')).hexdigest())
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def table_versions_query(*models):
+    # max(updated_at) and row count of each table, in one query: any
+    # insert, edit, touch() or delete changes one of them
+    columns = []
+    for model in models:
+        columns.append(db.select([db.func.max(model.updated_at)]).as_scalar())
+        columns.append(db.select([db.func.count()]).select_from(model.__table__).as_scalar())
+    return db.session.query(*columns)
+
+
+def table_versions(*models):
+    return tuple(table_versions_query(*models).one())
+
+
+def api_list_response(version, build):
+    """api_response(build()) for list endpoints, with an ETag made from
+    the request and `version`, a cheap summary of the data behind the list
+    (e.g. table_versions()); a client holding it gets its 304 without the
+    list being queried at all."""
+    etag = hashlib.sha256(json.dumps(
+        [request.full_path, *version], default=json_default).encode('utf-8')).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
+    return api_response(build(), etag)
+
+
+@api.route('/venues')
+@query_budget(2)
+def api_venues():
+    # the list is read from VenueDirectory, so it changes when that is
+    # rebuilt, not when Venue is written
+    version = [directory_version_query().scalar()]
+    return api_list_response(version, lambda: {'data': [{
+        'id': row.id,
+        'name': row.name,
+        'city': row.city,
+        'state': row.state,
+        'num_upcoming_shows': row.num_upcoming_shows
+    } for row in venue_rows(request.args.get('genre'))]})
+
+
+@api.route('/venues/search')
+@query_budget(1)
+def api_search_venues():
+    limit = search_limit(request.args)
+    return api_response(search_response(Venue, request.args.get('q', ''), limit))
+
+
+@api.route('/venues/nearby')
+@query_budget(2)
+def api_nearby_venues():
+    data = nearby_data()
+    if data is None:
+        abort(400)
+    return api_response(data)
+
+
+@api.route('/venues/<int:venue_id>')
+@query_budget(3)
+def api_venue(venue_id):
+    # served from the page cache, so a revalidation usually costs one query
+    last_modified = db.session.query(Venue.updated_at).filter(
+        Venue.id == venue_id).scalar()
+    if last_modified is None:
+        abort(404)
+    data = cached(detail_cache, detail_key(Venue, venue_id, last_modified),
+                  lambda: venue_page_data(venue_id))
+    if data is None:
+        abort(404)
+    return api_response(data)
+
+
+@api.route('/artists')
+@query_budget(2)
+def api_artists():
+    return api_list_response(table_versions(Artist), lambda: {'data': [{
+        'id': row.id,
+        'name': row.name
+    } for row in artist_rows(request.args.get('genre'))]})
+
+
+@api.route('/artists/search')
+@query_budget(1)
+def api_search_artists():
+    limit = search_limit(request.args)
+    return api_response(search_response(Artist, request.args.get('q', ''), limit))
+
+
+@api.route('/artists/<int:artist_id>')
+@query_budget(3)
+def api_artist(artist_id):
+    last_modified = db.session.query(Artist.updated_at).filter(
+        Artist.id == artist_id).scalar()
+    if last_modified is None:
+        abort(404)
+    data = cached(detail_cache, detail_key(Artist, artist_id, last_modified),
+                  lambda: artist_page_data(artist_id))
+    if data is None:
+        abort(404)
+    return api_response(data)
+
+
+@api.route('/venues/<int:venue_id>/calendar')
+@query_budget(2)
+def api_venue_calendar(venue_id):
+    return api_response(venue_calendar_data(venue_id))
+
+
+@api.route('/shows')
+@query_budget(3)
+def api_shows():
+    start, end = date_range()
+    limit = show_page_limit()
+    bucket = bucket_arg()
+    if bucket:
+        bounded_range(start, end)
+
+    def build():
+        data, next_cursor = show_page(request.args.get('after'), limit, start, end)
+        payload = {'data': data, 'next': next_cursor}
+        if bucket:
+            rows = show_buckets_query(start, end, bucket, db.engine.dialect.name).all()
+            payload['buckets'] = show_buckets(rows, start, end, bucket)
+        return payload
+
+    # show rows carry their venue's and artist's names and image
+    return api_list_response(table_versions(Show, Venue, Artist), build)
+
+
+@api.route('/shows/<int:show_id>')
+@query_budget(1)
+def api_show(show_id):
+    show = show_rows().filter(Show.id == show_id).first()
+    if show is None:
+        abort(404)
+    return api_response(show_dict(show))
+
+
+@main.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+shows_cli = AppGroup('shows', help='Maintain the stored show counters.')
+
+
+@shows_cli.command('rollover')
+@click.option('--minutes', default=60, show_default=True,
+              help='Look back this far for shows that have started.')
+def rollover_command(minutes):
+    """Move shows that have started from upcoming to past counters.
+
+    Run it from cron more often than --minutes; overlapping windows are
+    harmless because affected rows are recomputed, not decremented.
+    """
+    since = datetime.now() - timedelta(minutes=minutes)
+    refreshed = rollover_show_counts(since)
+    db.session.commit()
+    for table, count in refreshed.items():
+        click.echo(f'{table}: {count} rows recounted')
+    if refreshed.get(Venue.__tablename__):
+        refresh_directory(db.session, wait=True)
+
+
+@shows_cli.command('reconcile')
+@click.option('--check', is_flag=True,
+              help='Only report drift, do not repair it.')
+def reconcile_command(check):
+    """Verify the stored show counters against Shows and repair drift."""
+    drifted = 0
+    for model in (Venue, Artist):
+        rows = show_count_drift(model)
+        drifted += len(rows)
+        for row in rows:
+            click.echo(f'{model.__tablename__} {row[0]}: upcoming {row[1]} != {row[2]}, '
+                       f'past {row[3]} != {row[4]}')
+        if rows and not check:
+            refresh_show_counts(model, [row[0] for row in rows])
+    db.session.commit()
+    if drifted and not check:
+        refresh_directory(db.session, wait=True)
+    click.echo(f'{drifted} rows drifted' + ('' if check or not drifted else ', repaired'))
+    if check and drifted:
+        sys.exit(1)
+
+
+venues_cli = AppGroup('venues', help='Maintain venue locations.')
+
+
+@venues_cli.command('geocode')
+@click.option('--all', 'everything', is_flag=True,
+              help='Relocate every venue, not only those without a location.')
+def geocode_command(everything):
+    """Locate venues from the GEOCODE_FILE gazetteer by city and state.
+
+    Runs one UPDATE per distinct city. Venues in places the gazetteer does
+    not list keep a NULL location and are reported.
+    """
+    query = db.session.query(Venue.city, Venue.state, db.func.count(Venue.id)) \
+        .group_by(Venue.city, Venue.state)
+    if not everything:
+        query = query.filter(Venue.latitude.is_(None))
+
+    located = missing = 0
+    for city, state, count in query.all():
+        point = gazetteer.locate(city, state)
+        if point is None:
+            missing += count
+            click.echo(f'{city}, {state}: not in the gazetteer ({count} venues)')
+            continue
+        condition = db.and_(Venue.city == city, Venue.state == state)
+        if not everything:
+            condition = db.and_(condition, Venue.latitude.is_(None))
+        db.session.execute(Venue.__table__.update().where(condition).values(**geo.location(point)))
+        located += count
+    db.session.commit()
+    click.echo(f'{located} venues located, {missing} not found')
+
+
+def resolve_show_references(batch):
+    """Fill in artist_id/venue_id of show rows from artist_name/venue_name.
+
+    Returns the rows that resolved and (line, row, errors) for the rest;
+    a name must match exactly one record and an id must exist.
+    """
+    resolved, failures = [], []
+    for model, key in ((Artist, 'artist'), (Venue, 'venue')):
+        names = {row[f'{key}_name'] for _, row in batch
+                 if not row.get(f'{key}_id') and row.get(f'{key}_name')}
+        by_name = {}
+        for name, owner_id in db.session.query(model.name, model.id).filter(model.name.in_(names)):
+            by_name[name] = None if name in by_name else owner_id
+        ids = {str(row[f'{key}_id']) for _, row in batch if row.get(f'{key}_id')}
+        known = {str(row[0]) for row in db.session.query(model.id).filter(model.id.in_(ids))}
+        for _, row in batch:
+            if row.get(f'{key}_id'):
+                if str(row[f'{key}_id']) not in known:
+                    row.setdefault('_errors', {})[f'{key}_id'] = [f'No {key} with this id.']
+            elif by_name.get(row.get(f'{key}_name')):
+                row[f'{key}_id'] = by_name[row[f'{key}_name']]
+            else:
+                row.setdefault('_errors', {})[f'{key}_name'] = [f'Unknown or ambiguous {key}.']
+    for line, row in batch:
+        if '_errors' in row:
+            failures.append((line, row, row.pop('_errors')))
+        else:
+            resolved.append((line, row))
+    return resolved, failures
+
+
+def drop_show_conflicts(valid):
+    """Split validated show rows, (line, row, record), into those that can
+    be inserted and (line, row, errors) for the ones overlapping a show
+    already at the venue or an earlier row of the batch.
+
+    One query fetches the venues' shows around the batch's time span.
+    """
+    if not valid:
+        return valid, []
+    records = [record for _, _, record in valid]
+    booked = {}
+    for venue_id, start_time, end_time in db.session.query(
+            Show.venue_id, Show.start_time, Show.end_time).filter(
+            Show.venue_id.in_({int(record['venue_id']) for record in records}),
+            Show.start_time > min(record['start_time'] for record in records) - MAX_SHOW_DURATION,
+            Show.start_time < max(record['end_time'] for record in records)
+    ).order_by(Show.start_time):
+        starts, ends = booked.setdefault(venue_id, ([], []))
+        starts.append(start_time)
+        ends.append(end_time)
+
+    accepted, failures = [], []
+    for line, row, record in valid:
+        # a venue's shows do not overlap, so ends are sorted like starts
+        # and only the last show starting before this one ends can clash
+        starts, ends = booked.setdefault(int(record['venue_id']), ([], []))
+        before = bisect_left(starts, record['end_time'])
+        if before and ends[before - 1] > record['start_time']:
+            failures.append((line, row, {'start_time': [
+                'The venue already has a show at ' + starts[before - 1].isoformat() + '.']}))
+            continue
+        insort(starts, record['start_time'])
+        insort(ends, record['end_time'])
+        accepted.append((line, row, record))
+    return accepted, failures
+
+
+def write_import_batch(model, records):
+    # one transaction per batch; genre links and show counters go with it
+    connection = db.session.connection()
+    for owner_id, record in zip(allocate_ids(connection, model.__table__, len(records)), records):
+        record['id'] = owner_id
+    write_rows(connection, model.__table__, records)
+
+    if model is Show:
+        venue_ids = {record['venue_id'] for record in records}
+        artist_ids = {record['artist_id'] for record in records}
+        refresh_show_counts(Venue, venue_ids)
+        refresh_show_counts(Artist, artist_ids)
+        db.session.commit()
+        return
+
+    links, owner_key = (venue_genres, 'venue_id') if model is Venue else (artist_genres, 'artist_id')
+    names = {name for record in records for name in record['genres'].split(',')}
+    genres = lookup_genres(names)
+    db.session.add_all(genres)
+    db.session.flush()
+    genre_ids = {genre.name: genre.id for genre in genres}
+    write_rows(connection, links, [
+        {'genre_id': genre_ids[name], owner_key: record['id']}
+        for record in records for name in set(record['genres'].split(','))])
+    db.session.commit()
+
+
+IMPORT_KINDS = {
+    'venues': (Venue, VenueForm, venue_fields),
+    'artists': (Artist, ArtistForm, artist_fields),
+    'shows': (Show, ShowForm, show_fields),
+}
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(list(IMPORT_KINDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Rows per transaction.')
+@click.option('--rejects', type=click.File('w'),
+              help='Write rejected rows to this file as JSON lines.')
+@with_appcontext
+def import_command(kind, path, batch_size, rejects):
+    """Bulk load venues, artists or shows from a .csv or .jsonl file.
+
+    Rows are validated with the same forms as the web pages. Shows may
+    reference artists and venues by id or by artist_name/venue_name, and
+    may not overlap another show at the venue, in the database or earlier
+    in the file. Invalid rows, or a batch that fails to insert, are
+    reported and skipped without stopping the load.
+    """
+    model, form_class, fields = IMPORT_KINDS[kind]
+    imported = rejected = 0
+
+    for number, batch in enumerate(batched(read_rows(path), batch_size), 1):
+        started = time.perf_counter()
+        failures = []
+        if model is Show:
+            batch, failures = resolve_show_references(batch)
+
+        valid = []
+        for line, row in batch:
+            form = form_from_row(form_class, row)
+            if form.validate():
+                valid.append((line, row, fields(form)))
+            else:
+                failures.append((line, row, form.errors))
+        if model is Show:
+            valid, conflicts = drop_show_conflicts(valid)
+            failures.extend(conflicts)
+        records = [record for _, _, record in valid]
+
+        try:
+            if records:
+                write_import_batch(model, records)
+        except Exception as error:
+            db.session.rollback()
+            failures.extend((None, record, {'batch': [str(error)]}) for record in records)
+            records = []
+
+        for line, row, errors in failures:
+            if rejects:
+                rejects.write(json.dumps({'line': line, 'row': row, 'errors': errors},
+                                         default=str) + '\n')
+            else:
+                click.echo(f'line {line}: {errors}', err=True)
+
+        elapsed = time.perf_counter() - started
+        imported += len(records)
+        rejected += len(failures)
+        click.echo(f'batch {number}: {len(records)} imported, {len(failures)} rejected, '
+                   f'{len(records) / elapsed:.0f} rows/s')
+
+    if imported and model is not Artist:
+        refresh_directory(db.session, wait=True)
+    click.echo(f'{imported} {kind} imported, {rejected} rejected')
+
+
+def seed_table(model, rows, batch_size, links=None, owner_key=None, genre_ids=None):
+    # write generated rows (and their genre links) a batch per transaction;
+    # returns the ids given to them
+    ids = []
+    started = time.perf_counter()
+    for batch in batched(rows, batch_size):
+        connection = db.session.connection()
+        for owner_id, record in zip(allocate_ids(connection, model.__table__, len(batch)), batch):
+            record['id'] = owner_id
+        write_rows(connection, model.__table__, batch)
+        if links is not None:
+            write_rows(connection, links, [
+                {'genre_id': genre_ids[name], owner_key: record['id']}
+                for record in batch for name in record['genres'].split(',')])
+        db.session.commit()
+        ids.extend(record['id'] for record in batch)
+    click.echo(f'{model.__tablename__}: {len(ids)} rows in {time.perf_counter() - started:.1f}s')
+    return ids
+
+
+@click.command('seed')
+@click.option('--venues', default=1000, show_default=True)
+@click.option('--artists', default=500, show_default=True)
+@click.option('--shows', default=20000, show_default=True)
+@click.option('--skew', default=1.1, show_default=True,
+              help='Zipf exponent of venue and artist popularity.')
+@click.option('--seed', 'random_seed', default=0, show_default=True,
+              help='The same seed generates the same data.')
+@click.option('--batch-size', default=5000, show_default=True,
+              help='Rows per transaction.')
+@with_appcontext
+def seed_command(venues, artists, shows, skew, random_seed, batch_size):
+    """Fill the database with a synthetic dataset for benchmarks.
+
+    Rows are appended; start from an empty, migrated database for
+    comparable results, e.g.
+
+        flask db upgrade && flask seed --venues 100000 --artists 50000 --shows 2000000
+    """
+    rng = random.Random(random_seed)
+    # show times are local, created_at/updated_at UTC
+    now = datetime.now().replace(microsecond=0)
+    utc_now = datetime.utcnow().replace(microsecond=0)
+    names = [name for name, _ in GENRE_CHOICES]
+    genres = lookup_genres(names)
+    db.session.add_all(genres)
+    db.session.commit()
+    genre_ids = {genre.name: genre.id for genre in genres}
+
+    venue_ids = seed_table(Venue, seeding.venue_rows(rng, venues, names, utc_now, gazetteer.locate),
+                           batch_size, venue_genres, 'venue_id', genre_ids)
+    artist_ids = seed_table(Artist, seeding.artist_rows(rng, artists, names, utc_now),
+                            batch_size, artist_genres, 'artist_id', genre_ids)
+    duration = timedelta(minutes=current_app.config['SHOW_DURATION_MINUTES'])
+    seed_table(Show, seeding.show_rows(rng, shows, venue_ids, artist_ids, now, utc_now,
+                                       duration, skew), batch_size)
+
+    refresh_show_counts(Venue)
+    refresh_show_counts(Artist)
+    db.session.commit()
+    refresh_directory(db.session, wait=True)
+    # fresh planner statistics for the new data
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+    click.echo('show counters refreshed')
+
+#----------------------------------------------------------------------------#
+# Application factory.
+#----------------------------------------------------------------------------#
+
+
+def engine_options(app):
+    # SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings; queue pool sizing
+    # and the statement timeout only apply to server databases
+    options = {'pool_pre_ping': app.config['DB_POOL_PRE_PING']}
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite'):
+        return options
+    options.update(
+        pool_size=app.config['DB_POOL_SIZE'],
+        max_overflow=app.config['DB_MAX_OVERFLOW'],
+        pool_recycle=app.config['DB_POOL_RECYCLE'])
+    if uri.startswith('postgres') and app.config['DB_STATEMENT_TIMEOUT']:
+        options['connect_args'] = {
+            'options': f"-c statement_timeout={app.config['DB_STATEMENT_TIMEOUT']}"}
+    return options
+
+
+def create_app(config_name=None):
+    """Build the application for `config_name` ('development', 'testing' or
+    'production'), read from FLASK_CONFIG when not given."""
+    config_name = config_name or os.environ.get('FLASK_CONFIG', 'development')
+    app = Flask(__name__)
+    app.config.from_object(config[config_name])
+    config[config_name].init_app(app)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app))
+
+    if app.config['COMPRESS_RESPONSES']:
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app, app.config['COMPRESS_MIN_SIZE'],
+            app.config['COMPRESS_GZIP_LEVEL'], app.config['COMPRESS_BROTLI_QUALITY'])
+
+    db.init_app(app)
+    moment.init_app(app)
+    migrate.init_app(app, db)
+
+    # fingerprinted static files, see assets.py
+    init_assets(app)
+    # SQL/render timings and query budgets, see profiling.py
+    init_profiling(app)
+    # bytecode and {% cache %} fragment caches, see fragments.py
+    init_templates(app)
+
+    app.extensions['thumbnail_cache'] = ThumbnailCache(
+        app.config['THUMBNAIL_CACHE_DIR'], app.config['THUMBNAIL_CACHE_BYTES'],
+        allow_private=app.config['THUMBNAIL_ALLOW_PRIVATE'])
+    app.extensions['detail_cache'] = make_cache(app.config)
+    app.extensions['gazetteer'] = geo.Gazetteer(app.config['GEOCODE_FILE'])
+    app.extensions['directory_refresher'] = DirectoryRefresher(
+        app, app.config['DIRECTORY_REFRESH_DELAY'])
+    if app.config['CACHE_STATS_INTERVAL']:
+        caches = {'detail': app.extensions['detail_cache']}
+        if app.jinja_env.fragment_cache is not None:
+            caches['fragment'] = app.jinja_env.fragment_cache
+        app.after_request(StatsLogger(caches, app.config['CACHE_STATS_INTERVAL']))
+
+    app.jinja_env.filters['datetime'] = format_datetime
+    app.jinja_env.globals.update(
+        get_locale=get_locale,
+        thumbnail_url=thumbnail_url,
+        thumbnails_available=app.extensions['thumbnail_cache'].available,
+        thumbnail_sizes=sorted(app.config['THUMBNAIL_SIZES'].items(), key=lambda item: item[1]))
+
+    app.register_blueprint(main)
+    app.register_blueprint(api)
+
+    app.cli.add_command(shows_cli)
+    app.cli.add_command(venues_cli)
+    app.cli.add_command(import_command)
+    app.cli.add_command(seed_command)
+
+    # JSON logs with request ids, written off the request thread
+    init_logging(app)
+
+    return app
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -703,11 +2119,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,371 @@
+#----------------------------------------------------------------------------#
+# ASGI entry point.
+#
+#   uvicorn asgi:app --workers 4
+#
+# The read-only pages (venues, artists, shows, the two searches, the
+# venue/artist detail pages and the venue calendar) run on SQLAlchemy's
+# async engine, asyncpg on Postgres or aiosqlite for a local SQLite
+# database, so a worker keeps serving other requests while their queries
+# are in flight. They build
+# their queries with the same functions as the views in app.py and render
+# the same templates inside a Flask request context. Every other URL is
+# handed to the WSGI app on a worker thread.
+#
+# Needs Flask 2 (context locals backed by contextvars), SQLAlchemy 1.4 and
+# the asyncpg or aiosqlite driver.
+#----------------------------------------------------------------------------#
+
+import asyncio
+import io
+import os
+import sys
+
+from flask import abort, render_template, request
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from werkzeug.exceptions import HTTPException
+
+from app import (create_app, detail_cache, detail_key, venue_rows_query,
+                 directory_version_query, venue_areas, artist_rows_query,
+                 table_versions_query, search_query, search_limit,
+                 search_payload, venue_shows_query, venue_payload,
+                 artist_shows_query, artist_payload, show_page_query,
+                 show_page_result,
+                 show_page_limit, not_modified_since, not_modified_response,
+                 with_last_modified, date_range, bucket_arg, bounded_range,
+                 show_buckets_query, show_buckets, BUCKETS, calendar_range,
+                 venue_calendar_query, calendar_payload, adjacent_ranges)
+from cache import acached
+from compression import CompressionMiddleware
+from models import db, Venue, Artist
+
+ASYNC_DRIVERS = {
+    'postgres': 'postgresql+asyncpg',
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_uri(config):
+    if config['ASYNC_DATABASE_URI']:
+        return config['ASYNC_DATABASE_URI']
+    scheme, separator, rest = config['SQLALCHEMY_DATABASE_URI'].partition('://')
+    return ASYNC_DRIVERS[scheme.split('+')[0]] + separator + rest
+
+
+def async_engine_options(config, uri):
+    # the sync pool settings; asyncpg takes the statement timeout as a
+    # server setting instead of libpq options
+    options = dict(config['SQLALCHEMY_ENGINE_OPTIONS'])
+    options.pop('connect_args', None)
+    if uri.startswith('postgresql+asyncpg') and config['DB_STATEMENT_TIMEOUT']:
+        options['connect_args'] = {
+            'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT'])}}
+    return options
+
+
+#----------------------------------------------------------------------------#
+# Views.
+#----------------------------------------------------------------------------#
+
+# endpoint of the sync view -> coroutine serving it
+ASYNC_VIEWS = {}
+
+
+def async_view(endpoint):
+    def register(view):
+        ASYNC_VIEWS[endpoint] = view
+        return view
+    return register
+
+
+async def fetch_all(session, query):
+    # run a query built for the sync session on the async one
+    return (await session.execute(query.statement)).all()
+
+
+@async_view('main.venues')
+async def venues(session):
+    genre = request.args.get('genre')
+    version = await session.scalar(directory_version_query().statement)
+    data = venue_areas(await fetch_all(session, venue_rows_query(genre)))
+    return render_template('pages/venues.html', areas=data, genre=genre, version=version)
+
+
+@async_view('main.artists')
+async def artists(session):
+    genre = request.args.get('genre')
+    version = tuple((await session.execute(table_versions_query(Artist).statement)).one())
+    data = [{'id': artist.id, 'name': artist.name}
+            for artist in await fetch_all(session, artist_rows_query(genre))]
+    return render_template('pages/artists.html', artists=data, genre=genre, version=version)
+
+
+async def search(session, model):
+    search_term = request.form.get('search_term', '')
+    limit = search_limit(request.form)
+    query = search_query(model, search_term, limit, session.bind.dialect.name)
+    return search_payload(await fetch_all(session, query)), search_term
+
+
+@async_view('main.search_venues')
+async def search_venues(session):
+    response, search_term = await search(session, Venue)
+    return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+
+@async_view('main.search_artists')
+async def search_artists(session):
+    response, search_term = await search(session, Artist)
+    return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+
+async def last_modified(session, model, record_id):
+    last_modified = await session.scalar(
+        db.select([model.updated_at]).where(model.id == record_id))
+    if last_modified is None:
+        abort(404)
+    return last_modified
+
+
+async def venue_page_data(session, venue_id):
+    venue = await session.get(Venue, venue_id)
+    if venue is None:
+        return None
+    return venue_payload(venue, await fetch_all(session, venue_shows_query(venue_id)))
+
+
+async def artist_page_data(session, artist_id):
+    artist = await session.get(Artist, artist_id)
+    if artist is None:
+        return None
+    return artist_payload(artist, await fetch_all(session, artist_shows_query(artist_id)))
+
+
+@async_view('main.show_venue')
+async def show_venue(session, venue_id):
+    modified = await last_modified(session, Venue, venue_id)
+    if not_modified_since(modified):
+        return not_modified_response(modified)
+
+    data = await acached(detail_cache, detail_key(Venue, venue_id, modified),
+                         lambda: venue_page_data(session, venue_id))
+    if data is None:
+        abort(404)
+
+    return with_last_modified(
+        render_template('pages/show_venue.html', venue=data), modified)
+
+
+@async_view('main.show_artist')
+async def show_artist(session, artist_id):
+    modified = await last_modified(session, Artist, artist_id)
+    if not_modified_since(modified):
+        return not_modified_response(modified)
+
+    data = await acached(detail_cache, detail_key(Artist, artist_id, modified),
+                         lambda: artist_page_data(session, artist_id))
+    if data is None:
+        abort(404)
+
+    return with_last_modified(
+        render_template('pages/show_artist.html', artist=data), modified)
+
+
+@async_view('main.shows')
+async def shows(session):
+    limit = show_page_limit()
+    start, end = date_range()
+    query = show_page_query(request.args.get('after'), limit, start, end)
+    data, next_cursor = show_page_result(await fetch_all(session, query), limit)
+
+    bucket = bucket_arg()
+    buckets = None
+    if bucket:
+        bounded_range(start, end)
+        query = show_buckets_query(start, end, bucket, session.bind.dialect.name)
+        buckets = show_buckets(await fetch_all(session, query), start, end, bucket)
+
+    return render_template('pages/shows.html', shows=data, next_cursor=next_cursor, limit=limit,
+                           buckets=buckets, bucket=bucket, bucket_length=BUCKETS.get(bucket),
+                           range_from=request.args.get('from'), range_to=request.args.get('to'))
+
+
+@async_view('main.venue_calendar')
+async def venue_calendar(session, venue_id):
+    venue = (await session.execute(
+        db.select([Venue.id, Venue.name]).where(Venue.id == venue_id))).first()
+    if venue is None:
+        abort(404)
+    start, end = calendar_range()
+    bucket = bucket_arg('day')
+    shows = await fetch_all(session, venue_calendar_query(venue_id, start, end))
+    calendar = calendar_payload(venue, shows, start, end, bucket)
+    previous, following = adjacent_ranges(start, end)
+    return render_template('pages/venue_calendar.html', calendar=calendar,
+                           previous=previous, following=following)
+
+
+#----------------------------------------------------------------------------#
+# ASGI application.
+#----------------------------------------------------------------------------#
+
+
+async def read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return bytes(body)
+
+
+def wsgi_environ(scope, body):
+    # the WSGI environ of an ASGI http request, so Flask's Request can be used
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            key = 'HTTP_' + name
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def start_message(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in headers],
+    }
+
+
+class AsyncApp:
+    """Serves ASYNC_VIEWS natively and everything else through `flask_app`."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        # create_app's CompressionMiddleware, for the responses of async views
+        wsgi_app = flask_app.wsgi_app
+        self.compression = wsgi_app if isinstance(wsgi_app, CompressionMiddleware) else None
+        uri = async_database_uri(flask_app.config)
+        self.engine = create_async_engine(uri, **async_engine_options(flask_app.config, uri))
+        self.sessions = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+
+        environ = wsgi_environ(scope, await read_body(receive))
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            endpoint = None
+
+        view = ASYNC_VIEWS.get(endpoint)
+        if view is None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.call_wsgi, environ, send, loop)
+            return
+
+        # through the same encoder as the WSGI app, chunk by chunk
+        response = await self.dispatch(view, environ)
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [start_message(status, headers)]
+
+        if self.compression is not None:
+            app_iter = self.compression.respond(response, environ, start_response)
+        else:
+            app_iter = response(environ, start_response)
+        try:
+            for chunk in app_iter:
+                if started:
+                    await send(started.pop())
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        if started:
+            await send(started.pop())
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def dispatch(self, view, environ):
+        # Flask.wsgi_app/full_dispatch_request with an awaited view
+        app = self.flask_app
+        with app.request_context(environ):
+            try:
+                try:
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        async with self.sessions() as session:
+                            rv = await view(session, **request.view_args)
+                except Exception as error:
+                    rv = app.handle_user_exception(error)
+                return app.finalize_request(rv)
+            except Exception as error:
+                return app.make_response(app.handle_exception(error))
+
+    def call_wsgi(self, environ, send, loop):
+        # runs on an executor thread; the whole WSGI call stays on it so
+        # streamed responses keep their request context
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [start_message(status, headers)]
+
+        app_iter = self.flask_app(environ, start_response)
+        try:
+            for chunk in app_iter:
+                if started:
+                    emit(started.pop())
+                if chunk:
+                    emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        if started:
+            emit(started.pop())
+        emit({'type': 'http.response.body', 'body': b''})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+app = AsyncApp(create_app(os.environ.get('FLASK_CONFIG')))
@@ -0,0 +1,230 @@
+#----------------------------------------------------------------------------#
+# Fingerprinted static assets.
+#
+# `flask assets build` bundles the CSS/JS below, copies every static file
+# to static/dist under a content-hashed name, writes gzip (and brotli, when
+# the `brotli` package is installed) variants next to them and records the
+# mapping in static/dist/manifest.json. Templates ask for assets through
+# asset_url()/asset_urls(), which fall back to the plain source files
+# while no build exists. Outputs of earlier builds are kept, since cached
+# pages and other workers may still ask for them, until a build prunes
+# them with --clean or --max-age.
+#----------------------------------------------------------------------------#
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import time
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # optional, only .gz variants are written without it
+    brotli = None
+
+
+# bundle name -> source files, in load order
+BUNDLES = {
+    'css/app.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    # loaded synchronously in <head>
+    'js/head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    # loaded with defer after jQuery
+    'js/app.js': [
+        'js/script.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+}
+
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.json', '.eot', '.ttf', '.otf')
+
+DIST = 'dist'
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+CSS_SPACE = re.compile(r'\s*([{};,>])\s*')
+
+
+def fingerprint(name, content):
+    root, ext = posixpath.splitext(name)
+    return f'{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}'
+
+
+def absolute_css_urls(source, css):
+    # the bundle lives elsewhere, so relative url()s are made absolute
+    def replace(match):
+        quote, url = match.groups()
+        if re.match(r'^([a-z]+:|/|#)', url):
+            return match.group(0)
+        path = posixpath.normpath(posixpath.join('/static', posixpath.dirname(source), url))
+        return f'url({quote}{path}{quote})'
+    return CSS_URL.sub(replace, css)
+
+
+def minify_css(css):
+    # conservative: comments and whitespace around punctuation only
+    css = CSS_COMMENT.sub('', css)
+    css = CSS_SPACE.sub(r'\1', css)
+    return re.sub(r'\s+', ' ', css).replace(';}', '}').strip()
+
+
+def build_bundle(static_folder, name, sources):
+    parts = []
+    for source in sources:
+        with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+            text = f.read()
+        if name.endswith('.css'):
+            parts.append(minify_css(absolute_css_urls(source, text)))
+        else:
+            # libraries ship minified; guard against missing semicolons
+            parts.append(text.strip().rstrip(';') + ';')
+    return '\n'.join(parts).encode('utf-8')
+
+
+def write_asset(out_dir, name, content):
+    path = os.path.join(out_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    if name.endswith(COMPRESSIBLE):
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(content, 9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(content))
+
+
+def build(static_folder):
+    """Write static/dist and return the manifest; earlier outputs stay."""
+    out_dir = os.path.join(static_folder, DIST)
+    manifest = {}
+
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != out_dir]
+        for filename in files:
+            if filename.startswith('.'):
+                continue
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                content = f.read()
+            manifest[name] = fingerprint(name, content)
+            write_asset(out_dir, manifest[name], content)
+
+    for name, sources in BUNDLES.items():
+        content = build_bundle(static_folder, name, sources)
+        manifest[name] = fingerprint(name, content)
+        write_asset(out_dir, manifest[name], content)
+
+    # write-then-rename so a worker starting now never reads half a manifest
+    path = os.path.join(out_dir, 'manifest.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    return manifest
+
+
+def prune(static_folder, manifest, max_age=0):
+    """Remove outputs of earlier builds (files the manifest does not name,
+    with their .gz/.br variants) last written over `max_age` seconds ago;
+    return how many were removed."""
+    out_dir = os.path.join(static_folder, DIST)
+    current = {'manifest.json'} | set(manifest.values())
+    cutoff = time.time() - max_age
+    removed = 0
+    for root, dirs, files in os.walk(out_dir):
+        for filename in files:
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, out_dir).replace(os.sep, '/')
+            if name.endswith(('.gz', '.br')):
+                name = name[:-3]
+            if name not in current and os.path.getmtime(path) <= cutoff:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def load_manifest(app):
+    path = os.path.join(app.static_folder, DIST, 'manifest.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def asset_url(filename):
+    """url_for('static', filename=...) that prefers the fingerprinted copy."""
+    manifest = current_app.extensions['assets']
+    if filename in manifest:
+        return url_for('asset', filename=manifest[filename])
+    return url_for('static', filename=filename)
+
+
+def asset_urls(bundle):
+    # the built bundle, or its source files while there is no build
+    manifest = current_app.extensions['assets']
+    if bundle in manifest:
+        return [url_for('asset', filename=manifest[bundle])]
+    return [url_for('static', filename=source) for source in BUNDLES[bundle]]
+
+
+def send_asset(filename):
+    # fingerprinted names never change content: cache them for a year and
+    # hand out a precompressed variant when the client accepts one
+    directory = os.path.join(current_app.static_folder, DIST)
+    encoding = suffix = None
+    for candidate, candidate_suffix in (('br', '.br'), ('gzip', '.gz')):
+        if candidate in request.accept_encodings and \
+                os.path.exists(os.path.join(directory, filename + candidate_suffix)):
+            encoding, suffix = candidate, candidate_suffix
+            break
+
+    if encoding:
+        response = send_from_directory(directory, filename + suffix)
+        response.headers['Content-Encoding'] = encoding
+        response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    else:
+        response = send_from_directory(directory, filename)
+
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+def init_assets(app):
+    app.extensions['assets'] = load_manifest(app)
+    app.add_url_rule('/assets/<path:filename>', 'asset', send_asset)
+    app.jinja_env.globals.update(asset_url=asset_url, asset_urls=asset_urls)
+
+    @app.cli.group('assets')
+    def assets_cli():
+        """Build fingerprinted static assets."""
+
+    @assets_cli.command('build')
+    @click.option('--clean', is_flag=True,
+                  help='Remove every output of earlier builds.')
+    @click.option('--max-age', type=float,
+                  help='Remove outputs of earlier builds older than this many days.')
+    def build_command(clean, max_age):
+        """Bundle, fingerprint and precompress static files into static/dist."""
+        manifest = build(app.static_folder)
+        app.extensions['assets'] = manifest
+        click.echo(f'{len(manifest)} assets written to {os.path.join(app.static_folder, DIST)}')
+        if clean or max_age is not None:
+            removed = prune(app.static_folder, manifest, 0 if clean else max_age * 86400)
+            click.echo(f'{removed} old files removed')
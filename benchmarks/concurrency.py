@@ -0,0 +1,85 @@
+"""Benchmark: throughput and latency of the sync and ASGI servers as
+concurrency grows.
+
+Start both against the same database with the same number of workers:
+
+    gunicorn -w 4 -b 127.0.0.1:8000 "app:create_app('production')"
+    uvicorn asgi:app --workers 4 --port 8001
+
+then
+
+    python benchmarks/concurrency.py http://127.0.0.1:8000 http://127.0.0.1:8001 \\
+        [--path /venues/search --data search_term=band] [-c 1,8,32,128] [-n 400]
+
+Sync workers stop scaling once every worker is waiting on the database;
+the ASGI workers should keep gaining throughput at higher concurrency.
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def worker(base, path, data, count, latencies, errors):
+    url = urlsplit(base)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'} if data else {}
+    for _ in range(count):
+        started = time.perf_counter()
+        try:
+            connection.request('POST' if data else 'GET', path, body=data, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as error:
+            errors.append(error)
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+
+
+def run(base, path, data, concurrency, requests):
+    latencies, errors = [], []
+    per_thread = max(1, requests // concurrency)
+    threads = [threading.Thread(target=worker, args=(base, path, data, per_thread, latencies, errors))
+               for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('servers', nargs='+', help='base URLs, e.g. http://127.0.0.1:8000')
+    parser.add_argument('--path', default='/venues')
+    parser.add_argument('--data', help='form body; sends POST instead of GET')
+    parser.add_argument('-c', '--concurrency', default='1,8,32,128')
+    parser.add_argument('-n', '--requests', type=int, default=400,
+                        help='requests per concurrency level')
+    args = parser.parse_args()
+
+    print(f"{'server':<28} {'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for base in args.servers:
+        run(base, args.path, args.data, 4, 20)  # warm up pools and caches
+        for concurrency in map(int, args.concurrency.split(',')):
+            latencies, errors, elapsed = run(base, args.path, args.data, concurrency, args.requests)
+            print(f'{base:<28} {concurrency:>5} {len(latencies) / elapsed:>9.1f} '
+                  f'{statistics.median(latencies) * 1e3 if latencies else float("nan"):>8.1f} '
+                  f'{percentile(latencies, 0.95) * 1e3:>8.1f} {len(errors):>7}')
+
+
+if __name__ == '__main__':
+    main()
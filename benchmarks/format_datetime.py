@@ -0,0 +1,54 @@
+"""Micro-benchmark: show start time formatting, old path vs new path.
+
+    python benchmarks/format_datetime.py [-n NUMBER]
+
+The old path is what the views did before: stringify the datetime,
+reparse it with dateutil and let babel recompile the pattern, then do the
+same again in the template filter. The new path formats the datetime
+once with a cached pattern.
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import babel.dates  # noqa: E402
+import dateutil.parser  # noqa: E402
+from app import create_app, format_datetime  # noqa: E402
+
+FULL = "EEEE MMMM, d, y 'at' h:mma"
+MEDIUM = "EE MM, dd, y h:mma"
+
+
+def old_format_datetime(value, format):
+    date = dateutil.parser.parse(value)
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def old_path(start_time):
+    # view formatted to 'medium', template reparsed that and formatted 'full'
+    return old_format_datetime(old_format_datetime(str(start_time), MEDIUM), FULL)
+
+
+def new_path(start_time):
+    return format_datetime(start_time, 'full')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    start_time = datetime(2035, 4, 1, 20, 0)
+    app = create_app('testing')
+    with app.test_request_context(headers={'Accept-Language': 'en'}):
+        for name, func in (('old', old_path), ('new', new_path)):
+            seconds = min(timeit.repeat(lambda: func(start_time), number=args.number, repeat=3))
+            print(f'{name}: {seconds / args.number * 1e6:8.2f} us/call')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""Benchmark harness: drive every read route of app.py and report latency,
+throughput and query counts.
+
+    python benchmarks/routes.py [-n 50] [--only show_venue,shows]
+                                [--server http://127.0.0.1:8000]
+                                [--save] [--compare benchmarks/results/abc1234.json]
+    python benchmarks/routes.py --smoke
+
+Seed a database first and point DATABASE_URL at it:
+
+    flask db upgrade && flask seed --venues 100000 --artists 50000 --shows 2000000
+
+Requests go through the Flask test client unless --server names a
+running WSGI/ASGI server. Ids are sampled from the database and rotated
+so detail pages are not all served from the page cache. Query counts come
+from the Server-Timing header (PROFILE_REQUESTS); streamed pages have none
+there ('-'), their budgets are still checked under --smoke. --save writes
+benchmarks/results/<commit>.json; --compare prints the change against an
+earlier results file.
+
+--smoke migrates and seeds a throwaway SQLite database, runs every route
+a few times under the testing config (query budgets enforced) and exits
+non-zero on any error; fabfile.py's test() runs it.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS = os.path.join(ROOT, 'benchmarks', 'results')
+sys.path.insert(0, ROOT)
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+# routes that write, or fetch remote images, are not driven
+SKIPPED = {
+    'main.create_venue_submission', 'main.create_artist_submission',
+    'main.create_show_submission', 'main.edit_venue_submission',
+    'main.edit_artist_submission', 'main.delete_venue', 'main.thumbnail',
+    'static', 'asset',
+}
+
+
+def scenarios(ids):
+    """(name, method, path(i), form data) for the i-th request of each route."""
+    def rotate(kind, template):
+        values = ids[kind]
+        return lambda i: template.format(values[i % len(values)])
+
+    def fixed(path):
+        return lambda i: path
+
+    return [
+        ('index', 'GET', fixed('/'), None),
+        ('venues', 'GET', fixed('/venues'), None),
+        ('venues_by_genre', 'GET', fixed('/venues?genre=Jazz'), None),
+        ('search_venues', 'POST', fixed('/venues/search'), {'search_term': 'blue'}),
+        ('nearby_venues', 'GET', fixed('/venues/nearby?lat=40.7128&lng=-74.0060&radius=20'), None),
+        ('show_venue', 'GET', rotate('venues', '/venues/{}'), None),
+        ('edit_venue', 'GET', rotate('venues', '/venues/{}/edit'), None),
+        ('create_venue_form', 'GET', fixed('/venues/create'), None),
+        ('artists', 'GET', fixed('/artists'), None),
+        ('search_artists', 'POST', fixed('/artists/search'), {'search_term': 'band'}),
+        ('show_artist', 'GET', rotate('artists', '/artists/{}'), None),
+        ('edit_artist', 'GET', rotate('artists', '/artists/{}/edit'), None),
+        ('create_artist_form', 'GET', fixed('/artists/create'), None),
+        ('shows', 'GET', fixed('/shows'), None),
+        ('shows_by_week', 'GET', fixed(f"/shows?from={ids['month']}&to={ids['next_month']}&bucket=week"), None),
+        ('venue_calendar', 'GET', rotate('venues', '/venues/{}/calendar'), None),
+        ('api_venue_calendar', 'GET', rotate('venues', '/api/v1/venues/{}/calendar?bucket=week'), None),
+        ('create_shows', 'GET', fixed('/shows/create'), None),
+        ('export_shows', 'GET', fixed(f"/export/shows?since={ids['since']}"), None),
+        ('api_venues', 'GET', fixed('/api/v1/venues?fields=id,name'), None),
+        ('api_search_venues', 'GET', fixed('/api/v1/venues/search?q=blue'), None),
+        ('api_venue', 'GET', rotate('venues', '/api/v1/venues/{}'), None),
+        ('api_nearby_venues', 'GET', fixed('/api/v1/venues/nearby?lat=34.0522&lng=-118.2437&radius=50'), None),
+        ('api_artists', 'GET', fixed('/api/v1/artists'), None),
+        ('api_search_artists', 'GET', fixed('/api/v1/artists/search?q=band'), None),
+        ('api_artist', 'GET', rotate('artists', '/api/v1/artists/{}'), None),
+        ('api_shows', 'GET', fixed('/api/v1/shows'), None),
+        ('api_show', 'GET', rotate('shows', '/api/v1/shows/{}'), None),
+    ]
+
+
+def sample_ids(app, count=200):
+    from models import db, Venue, Artist, Show
+    with app.app_context():
+        ids = {kind: [row[0] for row in db.session.query(model.id)
+                      .order_by(db.func.random()).limit(count)]
+               for kind, model in (('venues', Venue), ('artists', Artist), ('shows', Show))}
+        # about the last 1000 shows changed
+        since = db.session.query(Show.updated_at).order_by(
+            Show.updated_at.desc()).offset(1000).limit(1).scalar()
+        ids['since'] = (since or datetime(1970, 1, 1)).isoformat()
+        month = datetime.now().date().replace(day=1)
+        ids['month'] = month.isoformat()
+        ids['next_month'] = (month + timedelta(days=32)).replace(day=1).isoformat()
+        ids['rows'] = {model.__tablename__: db.session.query(model).count()
+                       for model in (Venue, Artist, Show)}
+        ids['dialect'] = db.engine.dialect.name
+    if not all(ids[kind] for kind in ('venues', 'artists', 'shows')):
+        sys.exit('the database is empty; run `flask seed` first')
+    return ids
+
+
+def test_client_request(client):
+    def send(method, path, data):
+        response = client.open(path, method=method, data=data)
+        response.get_data()
+        return response.status_code, response.headers.get('Server-Timing', '')
+    return send
+
+
+def server_request(base):
+    url = urlsplit(base)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+
+    def send(method, path, data):
+        body = urlencode(data) if data else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if data else {}
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status, response.getheader('Server-Timing', '')
+    return send
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def measure(send, method, path, data, number):
+    latencies, queries, errors = [], [], []
+    started = time.perf_counter()
+    for i in range(number):
+        request_started = time.perf_counter()
+        try:
+            status, timing = send(method, path(i), data)
+        except Exception as error:
+            errors.append(f'{type(error).__name__}: {error}')
+            continue
+        latencies.append(time.perf_counter() - request_started)
+        if status >= 400:
+            errors.append(f'HTTP {status}')
+        match = QUERIES.search(timing)
+        if match:
+            queries.append(int(match.group(1)))
+    elapsed = time.perf_counter() - started
+    if not latencies:
+        return {'errors': errors}
+    return {
+        'p50_ms': round(percentile(latencies, 0.50) * 1e3, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1e3, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1e3, 2),
+        'rps': round(len(latencies) / elapsed, 1),
+        'queries': max(queries) if queries else None,
+        'errors': errors,
+    }
+
+
+def uncovered(app, routes):
+    adapter = app.url_map.bind('localhost')
+    covered = set()
+    for _, method, path, _ in routes:
+        covered.add(adapter.match(urlsplit(path(0)).path, method)[0])
+    return sorted({rule.endpoint for rule in app.url_map.iter_rules()} - covered - SKIPPED)
+
+
+def commit_id():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('-dirty' if dirty else '')
+
+
+def compare(results, path):
+    with open(path) as f:
+        before = json.load(f)
+    print(f"\nchange against {before['commit']} ({before['date']}):")
+    for name, now in results['routes'].items():
+        old = before['routes'].get(name)
+        if not old or 'p95_ms' not in old or 'p95_ms' not in now:
+            continue
+        change = (now['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0
+        queries = '' if now['queries'] == old['queries'] else f"  queries {old['queries']} -> {now['queries']}"
+        print(f'  {name:<22} p95 {old["p95_ms"]:>8.1f} -> {now["p95_ms"]:>8.1f} ms ({change:+.0f}%){queries}')
+
+
+def smoke_database():
+    # a migrated, seeded SQLite file for --smoke
+    path = os.path.join(tempfile.mkdtemp(prefix='fyyur-smoke-'), 'smoke.db')
+    os.environ['TEST_DATABASE_URL'] = f'sqlite:///{path}'
+    from flask_migrate import upgrade
+    from app import create_app, seed_command
+    app = create_app('testing')
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+    result = app.test_cli_runner().invoke(
+        seed_command, ['--venues', '50', '--artists', '30', '--shows', '400'])
+    if result.exit_code:
+        sys.exit(result.output)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--number', type=int, default=50, help='requests per route')
+    parser.add_argument('--config', default=os.environ.get('FLASK_CONFIG', 'development'))
+    parser.add_argument('--server', help='base URL of a running server')
+    parser.add_argument('--only', help='comma separated route names')
+    parser.add_argument('--save', action='store_true', help='write benchmarks/results/<commit>.json')
+    parser.add_argument('--compare', help='an earlier results file')
+    parser.add_argument('--smoke', action='store_true',
+                        help='seed a throwaway SQLite database and fail on any error')
+    args = parser.parse_args()
+
+    if args.smoke:
+        app = smoke_database()
+        args.config = 'testing'
+        args.number = 3
+    else:
+        from app import create_app
+        app = create_app(args.config)
+    # per-request profile lines would drown the report
+    app.logger.setLevel(logging.WARNING)
+
+    ids = sample_ids(app)
+    routes = scenarios(ids)
+    if args.only:
+        routes = [route for route in routes if route[0] in args.only.split(',')]
+    send = server_request(args.server) if args.server else test_client_request(app.test_client())
+
+    results = {
+        'commit': commit_id(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'target': args.server or f'test client ({args.config})',
+        'database': ids['dialect'],
+        'rows': ids['rows'],
+        'routes': {},
+    }
+    print(f"{results['target']} on {ids['dialect']}, rows {ids['rows']}, {args.number} requests per route")
+    print(f"{'route':<22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'queries':>8} {'errors':>7}")
+    for name, method, path, data in routes:
+        stats = measure(send, method, path, data, args.number)
+        results['routes'][name] = stats
+        if 'p50_ms' in stats:
+            print(f"{name:<22} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} "
+                  f"{stats['rps']:>8.1f} {stats['queries'] if stats['queries'] is not None else '-':>8} "
+                  f"{len(stats['errors']):>7}")
+        else:
+            print(f"{name:<22} {'failed':>8} {stats['errors'][0]}")
+
+    missing = uncovered(app, routes) if not args.only else []
+    if missing:
+        print('routes without a scenario:', ', '.join(missing))
+
+    if args.save:
+        os.makedirs(RESULTS, exist_ok=True)
+        path = os.path.join(RESULTS, f"{results['commit']}.json")
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print('saved', os.path.relpath(path, ROOT))
+    if args.compare:
+        compare(results, args.compare)
+
+    failed = {name: stats['errors'] for name, stats in results['routes'].items() if stats['errors']}
+    if failed:
+        for name, errors in failed.items():
+            print(f'{name}: {errors[0]}', file=sys.stderr)
+        if args.smoke:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
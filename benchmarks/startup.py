@@ -0,0 +1,59 @@
+"""Benchmark: worker boot time, i.e. importing app and calling create_app().
+
+    python benchmarks/startup.py [-n NUMBER] [--config NAME]
+
+Each run is a fresh interpreter, like a newly forked gunicorn worker
+without --preload. Also lists which of the heavy optional modules were
+imported during boot. The app itself only loads babel, dateutil and PIL
+on first use, but Flask-WTF imports babel and alembic (through
+Flask-Migrate) imports dateutil, so with the pinned requirements those
+two are listed; PIL should not be.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ['babel', 'dateutil', 'PIL', 'redis', 'brotli']
+
+BOOT = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app(sys.argv[1])
+created = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'loaded': [name for name in sys.argv[2:] if name in sys.modules],
+}))
+'''
+
+
+def boot(config_name):
+    env = dict(os.environ, SECRET_KEY=os.environ.get('SECRET_KEY', 'benchmark'))
+    output = subprocess.run(
+        [sys.executable, '-c', BOOT, config_name, *HEAVY],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--number', type=int, default=10)
+    parser.add_argument('--config', default='production')
+    args = parser.parse_args()
+
+    runs = [boot(args.config) for _ in range(args.number)]
+    for phase in ('import', 'create_app'):
+        print(f'{phase}: {statistics.median(run[phase] for run in runs) * 1e3:8.1f} ms (median)')
+    print('heavy modules loaded at boot:', ', '.join(runs[-1]['loaded']) or 'none')
+
+
+if __name__ == '__main__':
+    main()
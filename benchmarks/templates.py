@@ -0,0 +1,86 @@
+"""Benchmark: template compile and list page render times, with and without
+the template caches of fragments.py.
+
+    python benchmarks/templates.py [-n NUMBER] [--shows 30]
+
+compile: loading every template under templates/ into a fresh Jinja
+environment, as a new worker does, from source and from a populated
+bytecode cache. render: pages/shows.html with --shows synthetic tiles,
+with the fragment cache off and warm (every tile a hit), and the
+venues/artists pages for comparison. No database is needed.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template  # noqa: E402
+from jinja2 import FileSystemBytecodeCache  # noqa: E402
+from app import create_app  # noqa: E402
+
+
+def compile_all(app, bytecode_cache):
+    env = app.jinja_env.overlay(cache_size=0, bytecode_cache=bytecode_cache)
+    for name in env.list_templates(extensions=['html']):
+        env.get_template(name)
+
+
+def show_tiles(count):
+    start = datetime(2035, 4, 1, 20, 0)
+    return [{
+        'id': number,
+        'venue_id': number % 50,
+        'venue_name': f'The Blue Room {number % 50}',
+        'artist_id': number % 80,
+        'artist_name': f'The Wild Echoes {number % 80}',
+        'artist_image_link': f'https://images.example.com/artists/{number % 80}.jpg',
+        'start_time': start + timedelta(days=number),
+    } for number in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--number', type=int, default=200)
+    parser.add_argument('--shows', type=int, default=30)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    directory = tempfile.mkdtemp(prefix='fyyur-jinja-')
+    try:
+        bytecode_cache = FileSystemBytecodeCache(directory)
+        compile_all(app, bytecode_cache)
+        for name, cache in (('compile from source', None), ('compile from bytecode', bytecode_cache)):
+            seconds = min(timeit.repeat(lambda: compile_all(app, cache), number=5, repeat=3)) / 5
+            print(f'{name:<28} {seconds * 1e3:8.2f} ms')
+    finally:
+        shutil.rmtree(directory)
+
+    shows = show_tiles(args.shows)
+    areas = [{'city': 'San Francisco', 'state': 'CA', 'venues': [
+        {'id': number, 'name': f'The Blue Room {number}', 'num_upcoming_shows': 3}
+        for number in range(args.shows)]}]
+    artists = [{'id': number, 'name': f'The Wild Echoes {number}'} for number in range(args.shows)]
+    pages = {
+        'shows': lambda: render_template('pages/shows.html', shows=shows, next_cursor=None, limit=30),
+        'venues': lambda: render_template('pages/venues.html', areas=areas, genre=None),
+        'artists': lambda: render_template('pages/artists.html', artists=artists, genre=None),
+    }
+
+    fragment_cache = app.jinja_env.fragment_cache
+    with app.test_request_context(headers={'Accept-Language': 'en'}):
+        for page, render in pages.items():
+            for name, cache in (('fragments off', None), ('fragments warm', fragment_cache)):
+                app.jinja_env.fragment_cache = cache
+                render()
+                seconds = min(timeit.repeat(render, number=args.number, repeat=3)) / args.number
+                print(f'render {page:<8} {name:<15} {seconds * 1e3:8.3f} ms')
+    print('fragment cache:', fragment_cache.stats())
+
+
+if __name__ == '__main__':
+    main()
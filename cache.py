@@ -0,0 +1,183 @@
+#----------------------------------------------------------------------------#
+# Object cache for assembled page payloads.
+#----------------------------------------------------------------------------#
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import current_app
+
+
+def _encode(value):
+    # payloads carry show start times as datetimes
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _decode(obj):
+    if '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+class LRUCache:
+    """In-process cache bounded by entry count, with a per-entry TTL.
+
+    Least recently used entries are evicted once `maxsize` is reached;
+    expired entries are dropped when they are next looked up.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            'backend': 'memory',
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class RedisCache:
+    """Cache stored in a Redis-protocol server, values encoded as JSON.
+
+    Eviction is done by the server (set a maxmemory policy there); the
+    eviction counter reports the server's `evicted_keys`.
+    """
+
+    def __init__(self, url, ttl=300, prefix='fyyur:'):
+        import redis  # optional dependency, only needed for this backend
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value, object_hook=_decode)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value, default=_encode), ex=ttl or self.ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        return {
+            'backend': 'redis',
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.client.info('stats').get('evicted_keys', 0),
+        }
+
+
+def make_cache(config):
+    # build the backend named by CACHE_BACKEND ('memory' or 'redis')
+    backend = config.get('CACHE_BACKEND', 'memory')
+    ttl = config.get('CACHE_TTL', 300)
+    if backend == 'redis':
+        return RedisCache(config['CACHE_REDIS_URL'], ttl=ttl)
+    if backend == 'memory':
+        return LRUCache(maxsize=config.get('CACHE_MAXSIZE', 1024), ttl=ttl)
+    raise ValueError(f"unknown CACHE_BACKEND {backend!r}")
+
+
+def cached(cache, key, build):
+    """Read-through lookup: return the cached value or build and store it.
+
+    `build` may return None (e.g. record not found), which is not cached.
+    """
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        if value is not None:
+            cache.set(key, value)
+    return value
+
+
+async def acached(cache, key, build):
+    # cached() for a coroutine function `build`, used by asgi.py
+    value = cache.get(key)
+    if value is None:
+        value = await build()
+        if value is not None:
+            cache.set(key, value)
+    return value
+
+
+class StatsLogger:
+    """after_request hook logging the stats() of `caches` (name -> cache)
+    to the app's 'cache' logger at most once every `interval` seconds.
+
+    The counters live in each process, so every worker logs its own; a
+    CLI command would only ever see a fresh, empty cache.
+    """
+
+    def __init__(self, caches, interval):
+        self.caches = caches
+        self.interval = interval
+        self.due = time.monotonic() + interval
+        self._lock = threading.Lock()
+
+    def __call__(self, response):
+        now = time.monotonic()
+        if now >= self.due:
+            with self._lock:
+                if now < self.due:
+                    return response
+                self.due = now + self.interval
+            current_app.logger.getChild('cache').info('cache stats', extra={
+                'caches': {name: cache.stats() for name, cache in self.caches.items()}})
+        return response
@@ -0,0 +1,129 @@
+#----------------------------------------------------------------------------#
+# Response compression.
+#
+# A WSGI middleware that gzip- or brotli-encodes text responses for
+# clients that accept it (brotli only when the `brotli` package is
+# installed). Each chunk of the body is compressed and flushed as it
+# arrives, so streamed pages and exports stay streamed instead of being
+# buffered whole. Responses that already carry a Content-Encoding (the
+# precompressed assets), partial content and no-transform responses pass
+# through untouched.
+#----------------------------------------------------------------------------#
+
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+COMPRESSIBLE = {
+    'application/javascript', 'application/json', 'application/x-ndjson',
+    'application/xml', 'image/svg+xml',
+}
+
+
+def compressible_type(content_type):
+    mimetype = content_type.split(';', 1)[0].strip().lower()
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE
+
+
+class GzipEncoder:
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def encode(self, chunk):
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def encode(self, chunk):
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """Wraps a WSGI app; see the module comment."""
+
+    def __init__(self, app, min_size=500, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def negotiate(self, environ):
+        # the client's preferred encoding among ours, br on a tie
+        accept = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        return accept.best_match(self.encodings)
+
+    def compressible(self, status, headers):
+        code = int(status.split(' ', 1)[0])
+        length = headers.get('Content-Length', type=int)
+        return (200 <= code and code not in (204, 206, 304)
+                and 'Content-Encoding' not in headers
+                and 'no-transform' not in headers.get('Cache-Control', '')
+                and compressible_type(headers.get('Content-Type', ''))
+                and (length is None or length >= self.min_size))
+
+    def encoder(self, encoding):
+        if encoding == 'br':
+            return BrotliEncoder(self.brotli_quality)
+        return GzipEncoder(self.gzip_level)
+
+    def __call__(self, environ, start_response):
+        return self.respond(self.app, environ, start_response)
+
+    def respond(self, app, environ, start_response):
+        """Calls the WSGI callable `app` (the wrapped app, or a Response
+        built outside it, as asgi.py's async views do) and encodes its
+        body for the client."""
+        encoding = self.negotiate(environ)
+        if encoding is None or environ['REQUEST_METHOD'] == 'HEAD':
+            return app(environ, start_response)
+
+        compressing = []
+
+        def compressing_start_response(status, headers, exc_info=None):
+            headers = Headers(headers)
+            if self.compressible(status, headers):
+                compressing.append(True)
+                headers.remove('Content-Length')
+                headers['Content-Encoding'] = encoding
+                vary = headers.get('Vary')
+                headers['Vary'] = f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'
+                # the bytes differ from the identity response's; a weak
+                # ETag still revalidates (If-None-Match compares weakly)
+                etag = headers.get('ETag')
+                if etag and not etag.startswith('W/'):
+                    headers['ETag'] = 'W/' + etag
+            return start_response(status, headers.to_wsgi_list(), exc_info)
+
+        app_iter = app(environ, compressing_start_response)
+        if not compressing:
+            return app_iter
+        return ClosingIterator(self.compress(app_iter, self.encoder(encoding)),
+                               getattr(app_iter, 'close', None))
+
+    def compress(self, app_iter, encoder):
+        for chunk in app_iter:
+            if not chunk:
+                continue
+            data = encoder.encode(chunk)
+            if data:
+                yield data
+        yield encoder.finish()
@@ -0,0 +1,97 @@
+#----------------------------------------------------------------------------#
+# The /venues directory read model.
+#
+# VenueDirectory holds what the directory page shows of each venue, its
+# area, name and upcoming show count, indexed in page order. On Postgres
+# it is a materialized view rebuilt with REFRESH ... CONCURRENTLY, so
+# readers keep seeing the previous contents and never wait on a refresh;
+# elsewhere it is a summary table rebuilt in one transaction. Writes that
+# change venues or show counts call schedule(); refreshes requested within
+# DIRECTORY_REFRESH_DELAY seconds of each other are coalesced into one, so
+# the directory lags writes by about that much. Each rebuild stamps
+# VenueDirectoryRefresh, the validator of the API's venue list.
+#----------------------------------------------------------------------------#
+
+import threading
+from datetime import datetime
+
+from models import db, Venue, venue_directory, directory_refresh
+
+# pg_advisory_xact_lock key held while refreshing, so timer refreshes do
+# not queue behind each other (inline ones wait for it)
+REFRESH_LOCK = 0x76656e7565
+
+
+def directory_select():
+    return db.select([
+        Venue.id.label('venue_id'),
+        Venue.city,
+        Venue.state,
+        Venue.name,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    ])
+
+
+def refresh_directory(session, wait=False):
+    """Rebuild VenueDirectory and commit; False if another process holds
+    the refresh lock (its refresh may predate the caller's writes), unless
+    `wait` is set and the lock is waited for instead."""
+    if session.bind.dialect.name == 'postgresql':
+        if wait:
+            session.execute(db.text('SELECT pg_advisory_xact_lock(:key)'), {'key': REFRESH_LOCK})
+        elif not session.execute(db.text('SELECT pg_try_advisory_xact_lock(:key)'),
+                                 {'key': REFRESH_LOCK}).scalar():
+            session.rollback()
+            return False
+        session.execute(db.text('REFRESH MATERIALIZED VIEW CONCURRENTLY "VenueDirectory"'))
+    else:
+        session.execute(venue_directory.delete())
+        session.execute(venue_directory.insert().from_select(
+            [column.name for column in venue_directory.columns], directory_select()))
+    session.execute(directory_refresh.update().values(refreshed_at=datetime.utcnow()))
+    session.commit()
+    return True
+
+
+class DirectoryRefresher:
+    """Runs refresh_directory() on a timer thread `delay` seconds after the
+    first schedule() of a burst; with no delay, before schedule() returns.
+    A failed refresh is logged, never raised: the write that asked for it
+    has already been committed."""
+
+    def __init__(self, app, delay):
+        self.app = app
+        self.delay = delay
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def schedule(self):
+        if not self.delay:
+            # a refresh running elsewhere may predate our write: wait for it
+            self._refresh(wait=True)
+            return
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._run)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _run(self):
+        # writes committed from here on start a new timer
+        with self._lock:
+            self._timer = None
+        with self.app.app_context():
+            try:
+                if self._refresh() is False:
+                    self.schedule()
+            finally:
+                db.session.remove()
+
+    def _refresh(self, wait=False):
+        # refresh_directory()'s result, None if it failed
+        try:
+            return refresh_directory(db.session, wait)
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception('venue directory refresh failed')
+            return None
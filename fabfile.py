@@ -5,9 +5,11 @@ from fabric.contrib.console import confirm
 
 
 def test():
+    # every route against a small seeded SQLite database, query budgets
+    # enforced; see benchmarks/routes.py
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python benchmarks/routes.py --smoke", capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
@@ -0,0 +1,89 @@
+#----------------------------------------------------------------------------#
+# Template caching.
+#
+# Compiled templates are kept on disk (TEMPLATE_BYTECODE_CACHE_DIR) so a
+# fresh worker loads bytecode instead of compiling every template again.
+# Workers share the directory; files are written aside and renamed into
+# place, so none ever loads one half written.
+# Rendered fragments are kept in a bounded in-process LRU:
+#
+#   {% cache ('show', show.id, show.start_time, show.artist_name), 300 %}
+#     ...tile...
+#   {% endcache %}
+#
+# The key should hold everything the fragment renders from, so a changed
+# record renders fresh without any invalidation; the ttl (seconds) is
+# optional and defaults to FRAGMENT_CACHE_TTL.
+#----------------------------------------------------------------------------#
+
+import os
+import tempfile
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from cache import LRUCache
+
+
+class AtomicBytecodeCache(FileSystemBytecodeCache):
+    """FileSystemBytecodeCache writing each file to a temporary name and
+    renaming it over the old one (Jinja 3.0 writes in place)."""
+
+    def dump_bytecode(self, bucket):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                bucket.write_bytecode(f)
+            os.replace(tmp, self._get_cache_filename(bucket))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+
+def fragment_key(template, lineno, key):
+    # one namespace per {% cache %} block; repr() keeps the parts apart
+    # (joined strings could collide, e.g. ('a:b', 'c') and ('a', 'b:c'))
+    parts = tuple(key) if isinstance(key, (tuple, list)) else (key,)
+    return repr((template, lineno, parts))
+
+
+class FragmentCacheExtension(Extension):
+    """The {% cache key[, ttl] %}...{% endcache %} tag, storing into
+    `environment.fragment_cache` (rendering uncached while it is None)."""
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [nodes.Const(parser.name), nodes.Const(lineno), parser.parse_expression()]
+        args.append(parser.parse_expression() if parser.stream.skip_if('comma') else nodes.Const(None))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', args), [], [], body).set_lineno(lineno)
+
+    def _render(self, template, lineno, key, ttl, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        key = fragment_key(template, lineno, key)
+        html = cache.get(key)
+        if html is None:
+            html = caller()
+            cache.set(key, str(html), ttl)
+        return Markup(html)
+
+
+def init_templates(app):
+    directory = app.config['TEMPLATE_BYTECODE_CACHE_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = AtomicBytecodeCache(directory)
+
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    if app.config['FRAGMENT_CACHE_MAXSIZE']:
+        app.jinja_env.fragment_cache = LRUCache(
+            maxsize=app.config['FRAGMENT_CACHE_MAXSIZE'], ttl=app.config['FRAGMENT_CACHE_TTL'])
@@ -0,0 +1,111 @@
+#----------------------------------------------------------------------------#
+# Venue locations.
+#
+# Venues are placed offline from a gazetteer (GEOCODE_FILE, a CSV of city,
+# state, latitude and longitude, e.g. built from the Census places file);
+# no geocoding service is called, so a venue sits at its city's point.
+# Each located venue also stores the cell of a fixed latitude/longitude
+# grid it falls in. Cells are numbered row by row, so the cells around a
+# point are one contiguous id range per grid row: a radius search is a few
+# range scans of one integer index, on any database.
+#----------------------------------------------------------------------------#
+
+import csv
+import math
+
+EARTH_RADIUS_MILES = 3958.8
+METERS_PER_MILE = 1609.344
+# miles per degree of latitude (and of longitude at the equator)
+MILES_PER_DEGREE = EARTH_RADIUS_MILES * math.pi / 180
+
+# grid cell size in degrees, about 7 miles of latitude; stored in
+# Venue.geo_cell, so changing it means running `flask venues geocode --all`
+CELL_DEGREES = 0.1
+ROWS = round(180 / CELL_DEGREES)
+COLUMNS = round(360 / CELL_DEGREES)
+
+
+def place_key(city, state):
+    return ' '.join(city.split()).casefold(), state.strip().upper()
+
+
+class Gazetteer:
+    """(city, state) -> (latitude, longitude), read from `path` on first use."""
+
+    def __init__(self, path):
+        self.path = path
+        self._places = None
+
+    def load(self):
+        places = {}
+        with open(self.path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                places[place_key(row['city'], row['state'])] = (
+                    float(row['latitude']), float(row['longitude']))
+        return places
+
+    def locate(self, city, state):
+        if self._places is None:
+            self._places = self.load()
+        return self._places.get(place_key(city or '', state or ''))
+
+
+def grid_row(latitude):
+    return min(int((latitude + 90) / CELL_DEGREES), ROWS - 1)
+
+
+def grid_column(longitude):
+    return min(int((longitude + 180) / CELL_DEGREES), COLUMNS - 1)
+
+
+def grid_cell(latitude, longitude):
+    return grid_row(latitude) * COLUMNS + grid_column(longitude)
+
+
+def location(point):
+    # Venue column values for a (latitude, longitude) point or None
+    if point is None:
+        return {'latitude': None, 'longitude': None, 'geo_cell': None}
+    latitude, longitude = point
+    return {'latitude': latitude, 'longitude': longitude,
+            'geo_cell': grid_cell(latitude, longitude)}
+
+
+def distance_miles(latitude, longitude, other_latitude, other_longitude):
+    # great circle (haversine) distance
+    lat1, lat2 = math.radians(latitude), math.radians(other_latitude)
+    dlat = lat2 - lat1
+    dlng = math.radians(other_longitude - longitude)
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius):
+    """(south, north, west, east) in degrees around a circle of `radius`
+    miles; west > east when the box crosses the antimeridian."""
+    span = radius / MILES_PER_DEGREE
+    south, north = max(latitude - span, -90.0), min(latitude + span, 90.0)
+    if south <= -90 or north >= 90:
+        return south, north, -180.0, 180.0
+    # widest at the edge nearer a pole
+    width = span / math.cos(math.radians(max(abs(south), abs(north))))
+    if width >= 180:
+        return south, north, -180.0, 180.0
+    west = (longitude - width + 180) % 360 - 180
+    east = (longitude + width + 180) % 360 - 180
+    return south, north, west, east
+
+
+def cell_ranges(south, north, west, east):
+    # [(first, last)] cell ids covering the box, adjacent ranges merged
+    first, last = grid_column(west), grid_column(east)
+    spans = [(first, last)] if first <= last else [(0, last), (first, COLUMNS - 1)]
+    ranges = []
+    for row in range(grid_row(south), grid_row(north) + 1):
+        for start, end in spans:
+            start, end = row * COLUMNS + start, row * COLUMNS + end
+            if ranges and ranges[-1][1] + 1 == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+    return ranges
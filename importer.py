@@ -0,0 +1,88 @@
+#----------------------------------------------------------------------------#
+# Bulk import helpers for `flask import`.
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+from itertools import islice
+
+from sqlalchemy import text
+from werkzeug.datastructures import MultiDict
+
+
+def read_rows(path):
+    """Stream (line number, row dict) pairs from a .csv or .jsonl file."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            # header is line 1
+            for line, row in enumerate(csv.DictReader(f), 2):
+                yield line, row
+        else:
+            for line, text in enumerate(f, 1):
+                if text.strip():
+                    yield line, json.loads(text)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def form_from_row(form_class, row):
+    # feed a row through a WTForms form exactly like a form POST would
+    formdata = MultiDict()
+    for key, value in row.items():
+        if value is None or value is False:
+            continue
+        if key == 'genres' and isinstance(value, str):
+            value = [genre.strip() for genre in value.split(',') if genre.strip()]
+        if isinstance(value, list):
+            for item in value:
+                formdata.add(key, item)
+        elif value is True:
+            formdata.add(key, 'y')
+        else:
+            formdata.add(key, str(value))
+    return form_class(formdata=formdata, meta={'csrf': False})
+
+
+def allocate_ids(connection, table, count):
+    """Reserve `count` primary keys so rows and their links can be written
+    without RETURNING.
+
+    Postgres draws them from the id sequence; elsewhere they follow MAX(id),
+    which is safe for the single-writer SQLite used in development.
+    """
+    name = table.name
+    if connection.dialect.name == 'postgresql':
+        result = connection.execute(text(
+            f"SELECT nextval(pg_get_serial_sequence('\"{name}\"', 'id')) "
+            "FROM generate_series(1, :count)"), {'count': count})
+        return [row[0] for row in result]
+    start = connection.execute(text(
+        f'SELECT COALESCE(MAX(id), 0) FROM "{name}"')).scalar()
+    return list(range(start + 1, start + count + 1))
+
+
+def write_rows(connection, table, rows):
+    """Insert a batch of dict rows: COPY on Postgres, executemany elsewhere."""
+    if not rows:
+        return
+    if connection.dialect.name == 'postgresql':
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row[column] for column in columns])
+        buffer.seek(0)
+        quoted = ', '.join(f'"{column}"' for column in columns)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert(
+            f'COPY "{table.name}" ({quoted}) FROM STDIN WITH (FORMAT csv)', buffer)
+    else:
+        connection.execute(table.insert(), rows)
@@ -0,0 +1,150 @@
+#----------------------------------------------------------------------------#
+# Structured logging.
+#
+# Every record is handed to a queue on the calling thread and written as
+# one JSON object per line by a QueueListener thread, so request threads
+# never block on stderr or the log file. Records carry the id of the
+# request they were logged in (X-Request-ID, or a generated one, which is
+# echoed on the response). Levels are set per logger name and DEBUG
+# records can be sampled.
+#----------------------------------------------------------------------------#
+
+import atexit
+import json
+import logging
+import os
+import random
+import re
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+# attributes every LogRecord has; anything else was passed in `extra`
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+REQUEST_ID = re.compile(r'^[\w.-]{1,64}$')
+
+_listener = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, with its `extra` fields as keys."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RecordQueueHandler(QueueHandler):
+    # QueueHandler.prepare() would flatten the record into a formatted
+    # string; keep the fields and only render what may not outlive the call
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class RequestIdFilter(logging.Filter):
+
+    def filter(self, record):
+        if has_request_context() and 'request_id' in g:
+            record.request_id = g.request_id
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Keeps `rate` of the DEBUG records; other levels always pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        record.sample_rate = self.rate
+        return random.random() < self.rate
+
+
+def start_request():
+    header = request.headers.get('X-Request-ID', '')
+    g.request_id = header if REQUEST_ID.match(header) else uuid.uuid4().hex
+
+
+def finish_request(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+
+def start_listener(queue, *handlers):
+    global _listener
+    _listener = QueueListener(queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_listener():
+    # drains the queue before returning
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def restart_listener():
+    # threads do not survive fork (gunicorn --preload): each worker needs
+    # its own listener on the inherited queue
+    if _listener is not None:
+        start_listener(_listener.queue, *_listener.handlers)
+
+
+def init_logging(app):
+    if app.config['LOG_FILE']:
+        handler = logging.FileHandler(app.config['LOG_FILE'])
+    else:
+        handler = logging.StreamHandler()
+    handler.setFormatter(JSONFormatter())
+
+    queue_handler = RecordQueueHandler(SimpleQueue())
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(DebugSampler(app.config['LOG_DEBUG_SAMPLE_RATE']))
+
+    root = logging.getLogger()
+    if _listener is None:
+        atexit.register(stop_listener)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=restart_listener)
+    else:
+        # a previous create_app() in this process
+        stop_listener()
+        for old in [h for h in root.handlers if isinstance(h, RecordQueueHandler)]:
+            root.removeHandler(old)
+    start_listener(queue_handler.queue, handler)
+
+    root.addHandler(queue_handler)
+    root.setLevel(app.config['LOG_LEVEL'])
+    app.logger.removeHandler(default_handler)
+    app.logger.setLevel(logging.NOTSET)
+    for name, level in app.config['LOG_LEVELS'].items():
+        logging.getLogger(name).setLevel(level)
+
+    app.before_request(start_request)
+    app.after_request(finish_request)
@@ -64,6 +64,14 @@ def run_migrations_online():
     # this callback is used to prevent an auto-migration from being generated
     # when there are no changes to the schema
     # reference: http://alembic.zzzcomputing.com/en/latest/cookbook.html
+    # materialized views are created by hand in their migration; compared
+    # by name since the reflected side has no info
+    views = {table.name for table in target_metadata.tables.values()
+             if table.info.get('is_view')}
+
+    def include_object(object, name, type_, reflected, compare_to):
+        return not (type_ == 'table' and name in views)
+
     def process_revision_directives(context, revision, directives):
         if getattr(config.cmd_opts, 'autogenerate', False):
             script = directives[0]
@@ -77,6 +85,7 @@ def run_migrations_online():
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
+            include_object=include_object,
             process_revision_directives=process_revision_directives,
             **current_app.extensions['migrate'].configure_args
         )
@@ -0,0 +1,75 @@
+"""add trigram / full-text search indexes for venues and artists
+
+Revision ID: 3c1f5e0b7d24
+Revises: 9ab3fce9a692
+Create Date: 2026-10-18 10:02:13.540917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f5e0b7d24'
+down_revision = '9ab3fce9a692'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ['Venue', 'Artist']
+
+# must match search_document() in app.py
+DOCUMENT = """(name || ' ' || city || ' ' || genres)"""
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        with op.get_context().autocommit_block():
+            for table in TABLES:
+                op.execute(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_{table}_search_trgm" '
+                    f'ON "{table}" USING gin ({DOCUMENT} gin_trgm_ops)')
+
+    elif dialect == 'sqlite':
+        # external-content FTS5 tables kept in sync by triggers
+        for table in TABLES:
+            fts = f'{table}_search'
+            op.execute(
+                f'CREATE VIRTUAL TABLE "{fts}" USING fts5('
+                f'name, city, genres, content="{table}", content_rowid="id", '
+                f"tokenize='trigram')")
+            op.execute(
+                f'CREATE TRIGGER "{fts}_ai" AFTER INSERT ON "{table}" BEGIN '
+                f'INSERT INTO "{fts}"(rowid, name, city, genres) '
+                f'VALUES (new.id, new.name, new.city, new.genres); END')
+            op.execute(
+                f'CREATE TRIGGER "{fts}_ad" AFTER DELETE ON "{table}" BEGIN '
+                f'INSERT INTO "{fts}"("{fts}", rowid, name, city, genres) '
+                f"VALUES ('delete', old.id, old.name, old.city, old.genres); END")
+            op.execute(
+                f'CREATE TRIGGER "{fts}_au" AFTER UPDATE OF name, city, genres ON "{table}" BEGIN '
+                f'INSERT INTO "{fts}"("{fts}", rowid, name, city, genres) '
+                f"VALUES ('delete', old.id, old.name, old.city, old.genres); "
+                f'INSERT INTO "{fts}"(rowid, name, city, genres) '
+                f'VALUES (new.id, new.name, new.city, new.genres); END')
+            op.execute(f'INSERT INTO "{fts}"("{fts}") VALUES (\'rebuild\')')
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        with op.get_context().autocommit_block():
+            for table in TABLES:
+                op.execute(
+                    f'DROP INDEX CONCURRENTLY IF EXISTS "ix_{table}_search_trgm"')
+
+    elif dialect == 'sqlite':
+        for table in TABLES:
+            fts = f'{table}_search'
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS "{fts}_{suffix}"')
+            op.execute(f'DROP TABLE IF EXISTS "{fts}"')
@@ -0,0 +1,45 @@
+"""add created_at/updated_at to Venue, Artist and Shows
+
+Revision ID: 5d90b3e6a1c8
+Revises: e41a6c2f8d17
+Create Date: 2026-10-18 15:48:02.371556
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d90b3e6a1c8'
+down_revision = 'e41a6c2f8d17'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ['Venue', 'Artist', 'Shows']
+
+
+def upgrade():
+    # SQLite cannot ADD COLUMN with a non-constant default, so the columns
+    # are added nullable, backfilled, and tightened where the dialect can.
+    # Both hold naive UTC: SQLite's CURRENT_TIMESTAMP already is UTC, on
+    # Postgres it follows the session time zone, hence timezone('utc', ...)
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    utc_now = "timezone('utc', now())" if postgres else 'CURRENT_TIMESTAMP'
+    for table in TABLES:
+        op.add_column(table, sa.Column('created_at', sa.DateTime(), nullable=True))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f'UPDATE "{table}" SET created_at = {utc_now}, updated_at = {utc_now}')
+
+    if postgres:
+        # server side default for rows written with COPY by `flask import`
+        for table in TABLES:
+            for column in ('created_at', 'updated_at'):
+                op.alter_column(table, column, nullable=False,
+                                server_default=sa.text(utc_now))
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'created_at')
@@ -0,0 +1,57 @@
+"""add Shows.end_time and forbid overlapping shows at a venue
+
+Revision ID: 7c3a9e2d5f14
+Revises: 5d90b3e6a1c8
+Create Date: 2026-10-18 20:05:41.218307
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3a9e2d5f14'
+down_revision = '5d90b3e6a1c8'
+branch_labels = None
+depends_on = None
+
+
+# existing shows get the default SHOW_DURATION_MINUTES
+DURATION_MINUTES = 180
+
+
+def upgrade():
+    bind = op.get_bind()
+    op.add_column('Shows', sa.Column('end_time', sa.DateTime(), nullable=True))
+
+    if bind.dialect.name != 'postgresql':
+        # SQLite: nullable at the database level like created_at; the
+        # overlap check is done by create_show_submission
+        op.execute(f'''UPDATE "Shows" SET end_time = datetime(start_time, '+{DURATION_MINUTES} minutes')''')
+        return
+
+    op.execute(f'''UPDATE "Shows" SET end_time = start_time + interval '{DURATION_MINUTES} minutes' ''')
+    op.alter_column('Shows', 'end_time', nullable=False)
+
+    conflicts = bind.execute(sa.text('''
+        SELECT count(*) FROM "Shows" a JOIN "Shows" b
+          ON a.venue_id = b.venue_id AND a.id < b.id
+         AND a.start_time < b.end_time AND b.start_time < a.end_time
+    ''')).scalar()
+    if conflicts:
+        raise RuntimeError(f'{conflicts} pairs of shows overlap at the same venue; '
+                           'move or delete them before upgrading')
+
+    # one venue, one show at a time; ranges are [start, end) so back to
+    # back shows are allowed
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute('''
+        ALTER TABLE "Shows" ADD CONSTRAINT "ex_Shows_venue_id_time"
+        EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)
+    ''')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER TABLE "Shows" DROP CONSTRAINT IF EXISTS "ex_Shows_venue_id_time"')
+    op.drop_column('Shows', 'end_time')
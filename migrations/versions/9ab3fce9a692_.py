@@ -0,0 +1,43 @@
+"""add indexes on Shows and Venue lookup columns
+
+Revision ID: 9ab3fce9a692
+Revises: 8021bdcb5032
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9ab3fce9a692'
+down_revision = '8021bdcb5032'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_Shows_venue_id_start_time', 'Shows', ['venue_id', 'start_time']),
+    ('ix_Shows_artist_id_start_time', 'Shows', ['artist_id', 'start_time']),
+    ('ix_Shows_start_time_id', 'Shows', ['start_time', 'id']),
+    ('ix_Venue_city_state', 'Venue', ['city', 'state']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, so on
+    # Postgres each index is built in an autocommit block and the tables
+    # stay writable while it runs
+    concurrently = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False,
+                            postgresql_concurrently=concurrently)
+
+
+def downgrade():
+    concurrently = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table,
+                          postgresql_concurrently=concurrently)
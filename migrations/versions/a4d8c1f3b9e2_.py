@@ -0,0 +1,46 @@
+"""add Venue.latitude/longitude/geo_cell for nearby search
+
+Revision ID: a4d8c1f3b9e2
+Revises: 7c3a9e2d5f14
+Create Date: 2026-10-18 21:12:37.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d8c1f3b9e2'
+down_revision = '7c3a9e2d5f14'
+branch_labels = None
+depends_on = None
+
+
+# the expression app.nearby_query() orders by when the index exists
+GEOGRAPHY = 'geography(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326))'
+
+
+def upgrade():
+    # existing venues are located afterwards by `flask venues geocode`
+    op.add_column('Venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('geo_cell', sa.Integer(), nullable=True))
+    op.create_index('ix_Venue_geo_cell', 'Venue', ['geo_cell'])
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    available = bind.execute(sa.text(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'postgis'")).first()
+    if available:
+        # nearest-first KNN scans; without PostGIS the grid index is used
+        op.execute('CREATE EXTENSION IF NOT EXISTS postgis')
+        op.execute(f'CREATE INDEX "ix_Venue_geography" ON "Venue" USING gist (({GEOGRAPHY}))')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS "ix_Venue_geography"')
+    op.drop_index('ix_Venue_geo_cell', table_name='Venue')
+    op.drop_column('Venue', 'geo_cell')
+    op.drop_column('Venue', 'longitude')
+    op.drop_column('Venue', 'latitude')
@@ -0,0 +1,50 @@
+"""add the VenueDirectory read model of /venues
+
+Revision ID: b5e9d2a7c0f3
+Revises: a4d8c1f3b9e2
+Create Date: 2026-10-18 22:03:19.845512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e9d2a7c0f3'
+down_revision = 'a4d8c1f3b9e2'
+branch_labels = None
+depends_on = None
+
+
+# must match directory.directory_select()
+SELECT = '''
+    SELECT id AS venue_id, city, state, name, upcoming_shows_count AS num_upcoming_shows
+      FROM "Venue"
+'''
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(f'CREATE MATERIALIZED VIEW "VenueDirectory" AS {SELECT} WITH DATA')
+        # REFRESH ... CONCURRENTLY needs a unique index
+        op.execute('CREATE UNIQUE INDEX "ix_VenueDirectory_venue_id" ON "VenueDirectory" (venue_id)')
+    else:
+        op.create_table(
+            'VenueDirectory',
+            sa.Column('venue_id', sa.Integer(), nullable=False),
+            sa.Column('city', sa.String(length=120), nullable=False),
+            sa.Column('state', sa.String(length=120), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('num_upcoming_shows', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('venue_id')
+        )
+        op.execute(f'INSERT INTO "VenueDirectory" {SELECT}')
+    op.create_index('ix_VenueDirectory_state_city_venue_id', 'VenueDirectory',
+                    ['state', 'city', 'venue_id'])
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP MATERIALIZED VIEW "VenueDirectory"')
+    else:
+        op.drop_table('VenueDirectory')
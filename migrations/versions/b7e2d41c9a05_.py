@@ -0,0 +1,83 @@
+"""normalize genres into Genre and VenueGenre/ArtistGenre tables
+
+Revision ID: b7e2d41c9a05
+Revises: 3c1f5e0b7d24
+Create Date: 2026-10-18 11:26:51.902377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d41c9a05'
+down_revision = '3c1f5e0b7d24'
+branch_labels = None
+depends_on = None
+
+
+# snapshot of forms.GENRE_CHOICES at the time of this migration
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll',
+    'Soul', 'Other',
+]
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    venue_genre = op.create_table('VenueGenre',
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ),
+    sa.PrimaryKeyConstraint('genre_id', 'venue_id')
+    )
+    op.create_index('ix_VenueGenre_venue_id', 'VenueGenre', ['venue_id'], unique=False)
+    artist_genre = op.create_table('ArtistGenre',
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+    sa.PrimaryKeyConstraint('genre_id', 'artist_id')
+    )
+    op.create_index('ix_ArtistGenre_artist_id', 'ArtistGenre', ['artist_id'], unique=False)
+
+    # backfill from the comma-joined strings; names outside the canonical
+    # list are kept as genres of their own
+    conn = op.get_bind()
+    names = list(GENRES)
+    links = {'Venue': [], 'Artist': []}
+    for table in links:
+        rows = conn.execute(sa.text(f'SELECT id, genres FROM "{table}"'))
+        for owner_id, genres in rows:
+            for name in {name.strip() for name in genres.split(',') if name.strip()}:
+                if name not in names:
+                    names.append(name)
+                links[table].append((owner_id, name))
+
+    op.bulk_insert(genre, [{'id': i, 'name': name} for i, name in enumerate(names, 1)])
+    ids = {name: i for i, name in enumerate(names, 1)}
+    op.bulk_insert(venue_genre, [
+        {'genre_id': ids[name], 'venue_id': owner_id} for owner_id, name in links['Venue']])
+    op.bulk_insert(artist_genre, [
+        {'genre_id': ids[name], 'artist_id': owner_id} for owner_id, name in links['Artist']])
+
+    if conn.dialect.name == 'postgresql':
+        # explicit ids were inserted; move the serial past them
+        op.execute("SELECT setval(pg_get_serial_sequence('\"Genre\"', 'id'), "
+                   "(SELECT MAX(id) FROM \"Genre\"))")
+
+
+def downgrade():
+    op.drop_index('ix_ArtistGenre_artist_id', table_name='ArtistGenre')
+    op.drop_table('ArtistGenre')
+    op.drop_index('ix_VenueGenre_venue_id', table_name='VenueGenre')
+    op.drop_table('VenueGenre')
+    op.drop_table('Genre')
@@ -0,0 +1,44 @@
+"""refresh the SQLite search index only when searched columns change
+
+Revision ID: c8f1a3d6e2b9
+Revises: b5e9d2a7c0f3
+Create Date: 2026-10-19 09:12:40.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f1a3d6e2b9'
+down_revision = 'b5e9d2a7c0f3'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ['Venue', 'Artist']
+
+
+def replace_update_trigger(columns):
+    # 3c1f5e0b7d24 now creates the narrower trigger; this brings databases
+    # migrated before that up to date
+    for table in TABLES:
+        fts = f'{table}_search'
+        op.execute(f'DROP TRIGGER IF EXISTS "{fts}_au"')
+        op.execute(
+            f'CREATE TRIGGER "{fts}_au" AFTER UPDATE {columns}ON "{table}" BEGIN '
+            f'INSERT INTO "{fts}"("{fts}", rowid, name, city, genres) '
+            f"VALUES ('delete', old.id, old.name, old.city, old.genres); "
+            f'INSERT INTO "{fts}"(rowid, name, city, genres) '
+            f'VALUES (new.id, new.name, new.city, new.genres); END')
+
+
+def upgrade():
+    # counter and updated_at writes no longer rewrite the FTS rows
+    if op.get_bind().dialect.name == 'sqlite':
+        replace_update_trigger('OF name, city, genres ')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        replace_update_trigger('')
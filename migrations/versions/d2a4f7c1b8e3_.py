@@ -0,0 +1,31 @@
+"""record when the VenueDirectory read model was last rebuilt
+
+Revision ID: d2a4f7c1b8e3
+Revises: c8f1a3d6e2b9
+Create Date: 2026-10-19 11:40:02.517309
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a4f7c1b8e3'
+down_revision = 'c8f1a3d6e2b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a single row, updated by directory.refresh_directory()
+    table = op.create_table(
+        'VenueDirectoryRefresh',
+        sa.Column('refreshed_at', sa.DateTime(), nullable=False)
+    )
+    op.bulk_insert(table, [{'refreshed_at': datetime.utcnow()}])
+
+
+def downgrade():
+    op.drop_table('VenueDirectoryRefresh')
@@ -0,0 +1,45 @@
+"""add stored upcoming/past show counters to Venue and Artist
+
+Revision ID: e41a6c2f8d17
+Revises: b7e2d41c9a05
+Create Date: 2026-10-18 13:05:37.664190
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41a6c2f8d17'
+down_revision = 'b7e2d41c9a05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+
+    # initial values; afterwards maintained by the app and `flask shows rollover`.
+    # Show times are naive local times compared against datetime.now(), so
+    # the split uses that clock too, not the database's (UTC) CURRENT_TIMESTAMP
+    now = sa.bindparam('now', datetime.now(), type_=sa.DateTime())
+    for table, fk in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.execute(sa.text(
+            f'UPDATE "{table}" SET '
+            f'upcoming_shows_count = (SELECT COUNT(*) FROM "Shows" '
+            f'WHERE "Shows".{fk} = "{table}".id AND "Shows".start_time > :now), '
+            f'past_shows_count = (SELECT COUNT(*) FROM "Shows" '
+            f'WHERE "Shows".{fk} = "{table}".id AND "Shows".start_time <= :now)'
+        ).bindparams(now))
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,30 @@
+"""index updated_at for /export?since=
+
+Revision ID: f3b8d0e5c2a7
+Revises: d2a4f7c1b8e3
+Create Date: 2026-10-19 14:05:48.203117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d0e5c2a7'
+down_revision = 'd2a4f7c1b8e3'
+branch_labels = None
+depends_on = None
+
+
+# (updated_at, id): the order export() streams changed rows in
+TABLES = ('Venue', 'Artist', 'Shows')
+
+
+def upgrade():
+    for table in TABLES:
+        op.create_index(f'ix_{table}_updated_at_id', table, ['updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_updated_at_id', table_name=table)
@@ -0,0 +1,180 @@
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+
+# bound to the application in create_app(), see app.py
+db = SQLAlchemy()
+
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f"<Genre ID {self.id}, {self.name}>"
+
+
+# genre links, keyed (genre_id, owner_id) so the primary key index serves
+# "all venues/artists of a genre"; the owner index serves the reverse
+venue_genres = db.Table(
+    'VenueGenre',
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id'), primary_key=True),
+    db.Index('ix_VenueGenre_venue_id', 'venue_id')
+)
+
+artist_genres = db.Table(
+    'ArtistGenre',
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id'), primary_key=True),
+    db.Index('ix_ArtistGenre_artist_id', 'artist_id')
+)
+
+
+def lookup_genres(names):
+    # Genre rows for the selected names, creating any that are missing
+    genres = Genre.query.filter(Genre.name.in_(names)).all()
+    known = {genre.name for genre in genres}
+    genres.extend(Genre(name=name) for name in names if name not in known)
+    return genres
+
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_city_state', 'city', 'state'),
+        db.Index('ix_Venue_geo_cell', 'geo_cell'),
+        db.Index('ix_Venue_updated_at_id', 'updated_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+    address = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(120))
+    genres = db.Column(db.String(120), nullable=False)
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    seeking_talent = db.Column(db.Boolean, default=False, nullable=False)
+    seeking_description = db.Column(db.String(500))
+    # from the gazetteer by city and state, NULL when it has no such place;
+    # geo_cell is geo.grid_cell() of the point, see geo.py
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geo_cell = db.Column(db.Integer)
+    # maintained on show insert/delete and by `flask shows rollover`
+    upcoming_shows_count = db.Column(db.Integer, nullable=False,
+                                     default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False,
+                                 default=0, server_default='0')
+    # UTC; updated_at also moves when a page showing this record changes
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+    shows = db.relationship('Show', backref='venues',
+                            lazy=True, cascade="all, delete-orphan")
+    # normalized copy of `genres` used for genre filtering
+    genre_tags = db.relationship('Genre', secondary=venue_genres,
+                                 lazy=True, backref='venues')
+
+    def __repr__(self):
+        return f"<Venue ID {self.id}, {self.name}, {self.city}>"
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_updated_at_id', 'updated_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(120))
+    genres = db.Column(db.String(120), nullable=False)
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    seeking_venue = db.Column(db.Boolean, default=False, nullable=False)
+    seeking_description = db.Column(db.String(500))
+    # maintained on show insert/delete and by `flask shows rollover`
+    upcoming_shows_count = db.Column(db.Integer, nullable=False,
+                                     default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False,
+                                 default=0, server_default='0')
+    # UTC; updated_at also moves when a page showing this record changes
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+    shows = db.relationship('Show', backref='artists',
+                            lazy=True, cascade="all, delete-orphan")
+    # normalized copy of `genres` used for genre filtering
+    genre_tags = db.relationship('Genre', secondary=artist_genres,
+                                 lazy=True, backref='artists')
+
+    def __repr__(self):
+        return f"<Venue ID {self.id}, {self.name}, {self.city}>"
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+
+# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+
+
+# the /venues directory in page order: a materialized view on Postgres,
+# a summary table elsewhere (migration b5e9d2a7c0f3); rebuilt by
+# directory.py, never written through the ORM
+venue_directory = db.Table(
+    'VenueDirectory',
+    db.Column('venue_id', db.Integer, primary_key=True),
+    db.Column('city', db.String(120), nullable=False),
+    db.Column('state', db.String(120), nullable=False),
+    db.Column('name', db.String, nullable=False),
+    db.Column('num_upcoming_shows', db.Integer, nullable=False),
+    db.Index('ix_VenueDirectory_state_city_venue_id', 'state', 'city', 'venue_id'),
+    info={'is_view': True}
+)
+
+# one row: when VenueDirectory was last rebuilt, the validator of the
+# /api/v1/venues list (migration d2a4f7c1b8e3)
+directory_refresh = db.Table(
+    'VenueDirectoryRefresh',
+    db.Column('refreshed_at', db.DateTime, nullable=False)
+)
+
+
+class Show(db.Model):
+    __tablename__ = 'Shows'
+    __table_args__ = (
+        db.Index('ix_Shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Shows_start_time_id', 'start_time', 'id'),
+        db.Index('ix_Shows_updated_at_id', 'updated_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    start_time = db.Column(db.DateTime, nullable=False,
+                           default=datetime.utcnow)
+    # shows at one venue may not overlap; enforced by an exclusion
+    # constraint on Postgres (migration 7c3a9e2d5f14) and checked by
+    # create_show_submission everywhere
+    end_time = db.Column(db.DateTime, nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey(
+        'Artist.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Show ID {self.id}, {self.venue_id}, {self.artist_id}>"
@@ -0,0 +1,163 @@
+#----------------------------------------------------------------------------#
+# Per-request SQL and template profiling.
+#
+# Every request counts its SQL statements and the time spent in them and
+# in template rendering, reports both in a Server-Timing header and a log
+# line, and warns when one statement shape runs more than
+# PROFILE_REPEAT_THRESHOLD times (the signature of an N+1 loop). Views
+# can declare a query_budget(); with QUERY_BUDGET_STRICT (the testing
+# config) going over it fails the request. Streamed bodies (the exports,
+# /shows and /artists) query and render while they are sent, after the
+# headers: they are logged and checked against the budget once the last
+# chunk is out, and their Server-Timing has no db entry.
+#----------------------------------------------------------------------------#
+
+import inspect
+import re
+import time
+from collections import Counter
+
+from flask import (before_render_template, current_app, g, has_request_context, request,
+                   stream_with_context, template_rendered)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# expanded IN lists of any length have the same shape
+IN_LIST = re.compile(r'\(\s*(?:\?|%\(\w+\)s|:\w+|\$\d+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+|\$\d+))+\s*\)')
+
+
+class QueryBudgetExceeded(Exception):
+    """A view issued more SQL statements than its query_budget()."""
+
+
+def query_budget(count):
+    """Declare the most SQL statements a view may issue per request."""
+    def decorate(view):
+        view.query_budget = count
+        return view
+    return decorate
+
+
+def statement_shape(statement):
+    return IN_LIST.sub('(...)', ' '.join(statement.split()))
+
+
+class RequestProfile:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.statements = Counter()
+        self._render_started = []
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values())
+
+    def repeated(self, threshold):
+        return [(shape, count) for shape, count in self.statements.most_common()
+                if count > threshold]
+
+    def server_timing(self, total):
+        return (f'db;dur={self.db_time * 1e3:.1f};desc="{self.queries} queries", '
+                f'render;dur={self.render_time * 1e3:.1f}, '
+                f'total;dur={total * 1e3:.1f}')
+
+
+def current_profile():
+    return g.get('profile') if has_request_context() else None
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.profile_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile()
+    started = getattr(context, 'profile_started', None)
+    if profile is None or started is None:
+        return
+    profile.queries += 1
+    profile.db_time += time.perf_counter() - started
+    profile.statements[statement_shape(statement)] += 1
+
+
+def start_render(sender, template, context, **extra):
+    profile = current_profile()
+    if profile is not None:
+        profile._render_started.append(time.perf_counter())
+
+
+def finish_render(sender, template, context, **extra):
+    profile = current_profile()
+    if profile is not None and profile._render_started:
+        profile.render_time += time.perf_counter() - profile._render_started.pop()
+
+
+def start_request():
+    g.profile = RequestProfile()
+
+
+def finish_request(response):
+    if 'profile' not in g:
+        return response
+    if inspect.isgenerator(response.response):
+        # the body has not run yet; see the module comment
+        response.headers['Server-Timing'] = f'total;dur={g.profile.elapsed() * 1e3:.1f}'
+        response.response = stream_with_context(profiled_body(response.response, response))
+        return response
+
+    profile = g.pop('profile')
+    response.headers['Server-Timing'] = profile.server_timing(profile.elapsed())
+    report(profile, response)
+    return response
+
+
+def profiled_body(chunks, response):
+    yield from chunks
+    report(g.pop('profile'), response)
+
+
+def report(profile, response):
+    total = profile.elapsed()
+    logger = current_app.logger.getChild('profile')
+    logger.info('%s %s %s', request.method, request.path, response.status_code, extra={
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'queries': profile.queries,
+        'duplicates': profile.duplicates,
+        'db_ms': round(profile.db_time * 1e3, 1),
+        'render_ms': round(profile.render_time * 1e3, 1),
+        'total_ms': round(total * 1e3, 1),
+    })
+
+    for shape, count in profile.repeated(current_app.config['PROFILE_REPEAT_THRESHOLD']):
+        logger.warning('%s ran the same statement %d times', request.endpoint, count,
+                       extra={'endpoint': request.endpoint, 'count': count, 'statement': shape})
+
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    if budget is not None and profile.queries > budget:
+        message = f'{request.endpoint} issued {profile.queries} queries, its budget is {budget}'
+        if current_app.config['QUERY_BUDGET_STRICT']:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def init_profiling(app):
+    if not app.config['PROFILE_REQUESTS']:
+        return
+    # engine events are global so the async engine of asgi.py is counted too
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+    before_render_template.connect(start_render, app)
+    template_rendered.connect(finish_render, app)
+    app.before_request(start_request)
+    app.after_request(finish_request)
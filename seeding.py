@@ -0,0 +1,162 @@
+#----------------------------------------------------------------------------#
+# Synthetic datasets for `flask seed`.
+#
+# Rows are plain dicts ready for importer.write_rows(). Popularity is
+# skewed with Zipf-like weights: a few cities hold most venues and a few
+# venues and artists get most of the shows, like real listings data.
+#----------------------------------------------------------------------------#
+
+import math
+from datetime import timedelta
+from itertools import accumulate
+
+import geo
+
+CITIES = [
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'),
+    ('Phoenix', 'AZ'), ('Philadelphia', 'PA'), ('San Antonio', 'TX'), ('San Diego', 'CA'),
+    ('Dallas', 'TX'), ('San Jose', 'CA'), ('Austin', 'TX'), ('Jacksonville', 'FL'),
+    ('San Francisco', 'CA'), ('Columbus', 'OH'), ('Fort Worth', 'TX'), ('Indianapolis', 'IN'),
+    ('Charlotte', 'NC'), ('Seattle', 'WA'), ('Denver', 'CO'), ('Washington', 'DC'),
+    ('Boston', 'MA'), ('Nashville', 'TN'), ('Detroit', 'MI'), ('Portland', 'OR'),
+    ('Las Vegas', 'NV'), ('Memphis', 'TN'), ('Louisville', 'KY'), ('Baltimore', 'MD'),
+    ('Milwaukee', 'WI'), ('Albuquerque', 'NM'), ('Tucson', 'AZ'), ('Fresno', 'CA'),
+    ('Sacramento', 'CA'), ('Atlanta', 'GA'), ('Kansas City', 'MO'), ('Miami', 'FL'),
+    ('Raleigh', 'NC'), ('Omaha', 'NE'), ('Minneapolis', 'MN'), ('New Orleans', 'LA'),
+]
+
+ADJECTIVES = [
+    'Blue', 'Golden', 'Velvet', 'Electric', 'Silver', 'Midnight', 'Crimson', 'Wild',
+    'Lucky', 'Hidden', 'Rusty', 'Neon', 'Quiet', 'Broken', 'Iron', 'Painted',
+]
+
+NOUNS = [
+    'Room', 'Hall', 'Lounge', 'Garden', 'Cellar', 'Tavern', 'Theatre', 'Barn',
+    'Fox', 'Owl', 'Harbor', 'Anchor', 'Lantern', 'Mill', 'Pearl', 'Canyon',
+]
+
+BAND_NOUNS = [
+    'Sax Band', 'Petals', 'Wolves', 'Collective', 'Quartet', 'Brothers', 'Sisters',
+    'Machines', 'Ghosts', 'Rivers', 'Orchestra', 'Kids', 'Trio', 'Echoes',
+]
+
+STREETS = ['Main St', 'Oak Ave', 'Market St', 'Broadway', '2nd St', 'Elm St', 'Mission St']
+
+
+def zipf_weights(count, exponent=1.1):
+    # cumulative weights for random.choices; rank 0 is the most popular
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+def timestamps(rng, now):
+    created = now - timedelta(days=rng.uniform(0, 3 * 365))
+    return created, created + (now - created) * rng.random() ** 4
+
+
+def scatter(rng, point, miles=15):
+    # a point up to `miles` from `point`, so a city's venues spread over
+    # its area instead of sharing the gazetteer's single point
+    latitude, longitude = point
+    distance = miles * math.sqrt(rng.random()) / geo.MILES_PER_DEGREE
+    bearing = rng.uniform(0, 2 * math.pi)
+    return (round(latitude + distance * math.cos(bearing), 6),
+            round(longitude + distance * math.sin(bearing) / math.cos(math.radians(latitude)), 6))
+
+
+def venue_rows(rng, count, genres, now, locate=None):
+    # `locate(city, state)` gives a city's (latitude, longitude) or None
+    city_weights = zipf_weights(len(CITIES))
+    for number in range(count):
+        city, state = rng.choices(CITIES, cum_weights=city_weights)[0]
+        name = f'The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}'
+        created, updated = timestamps(rng, now)
+        point = locate(city, state) if locate else None
+        yield {
+            'name': f'{name} {number}' if rng.random() < 0.5 else name,
+            'city': city,
+            'state': state,
+            'address': f'{rng.randint(1, 9999)} {rng.choice(STREETS)}',
+            'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+            'genres': ','.join(rng.sample(genres, rng.randint(1, 3))),
+            'image_link': f'https://images.example.com/venues/{number}.jpg',
+            'facebook_link': f'https://www.facebook.com/venue{number}',
+            'website': f'https://venue{number}.example.com',
+            'seeking_talent': rng.random() < 0.3,
+            'seeking_description': 'We are looking for local acts.' if rng.random() < 0.3 else None,
+            'created_at': created,
+            'updated_at': updated,
+            **geo.location(point and scatter(rng, point)),
+        }
+
+
+def artist_rows(rng, count, genres, now):
+    city_weights = zipf_weights(len(CITIES))
+    for number in range(count):
+        city, state = rng.choices(CITIES, cum_weights=city_weights)[0]
+        created, updated = timestamps(rng, now)
+        yield {
+            'name': f'The {rng.choice(ADJECTIVES)} {rng.choice(BAND_NOUNS)} {number}',
+            'city': city,
+            'state': state,
+            'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+            'genres': ','.join(rng.sample(genres, rng.randint(1, 2))),
+            'image_link': f'https://images.example.com/artists/{number}.jpg',
+            'facebook_link': f'https://www.facebook.com/artist{number}',
+            'website': f'https://artist{number}.example.com',
+            'seeking_venue': rng.random() < 0.3,
+            'seeking_description': 'Looking for shows this season.' if rng.random() < 0.3 else None,
+            'created_at': created,
+            'updated_at': updated,
+        }
+
+
+def show_rows(rng, count, venue_ids, artist_ids, now, utc_now, duration, exponent=1.1):
+    """`count` shows over the last two years and the next one, spread over
+    venues and artists with Zipf(`exponent`) popularity.
+
+    Show times are local like `now`; created_at/updated_at are UTC like
+    `utc_now`, as the app stores them.
+
+    Shows start on `duration` slots and a venue never has two in the same
+    slot, so a busy venue fills up and further draws go to other venues.
+    """
+    venues, artists = list(venue_ids), list(artist_ids)
+    # popularity rank independent of id order
+    rng.shuffle(venues)
+    rng.shuffle(artists)
+    venue_weights = zipf_weights(len(venues), exponent)
+    artist_weights = zipf_weights(len(artists), exponent)
+    start = now.replace(minute=0, second=0, microsecond=0) - timedelta(days=2 * 365)
+    slots = int(timedelta(days=3 * 365) / duration)
+    if count > slots * len(venues):
+        raise ValueError(f'{count} shows do not fit in {len(venues)} venues')
+    booked = {}
+    utc_offset = now - utc_now
+
+    remaining = count
+    while remaining:
+        size = min(remaining, 10000)
+        drawn = zip(rng.choices(venues, cum_weights=venue_weights, k=size),
+                    rng.choices(artists, cum_weights=artist_weights, k=size))
+        for venue_id, artist_id in drawn:
+            taken = booked.setdefault(venue_id, set())
+            slot = rng.randrange(slots)
+            # a few tries, then leave the draw to the next batch
+            for _ in range(3):
+                if slot not in taken:
+                    break
+                slot = rng.randrange(slots)
+            else:
+                continue
+            taken.add(slot)
+            remaining -= 1
+            start_time = start + slot * duration
+            created = min(start_time - utc_offset, utc_now) - timedelta(days=rng.uniform(0, 90))
+            yield {
+                'venue_id': venue_id,
+                'artist_id': artist_id,
+                'start_time': start_time,
+                'end_time': start_time + duration,
+                'created_at': created,
+                'updated_at': created,
+            }
@@ -0,0 +1,46 @@
+#----------------------------------------------------------------------------#
+# Chunked encoders for streamed responses.
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+from datetime import date
+from itertools import islice
+
+
+def json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ndjson_chunks(columns, rows, size=500):
+    """One JSON object per row, `size` rows per yielded string."""
+    for chunk in _chunks(rows, size):
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), default=json_default) + '\n'
+            for row in chunk)
+
+
+def csv_chunks(columns, rows, size=500):
+    """A header line, then `size` CSV rows per yielded string."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in _chunks(rows, size):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
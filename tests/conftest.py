@@ -0,0 +1,65 @@
+import os
+import re
+from datetime import timedelta
+
+import pytest
+from flask_migrate import upgrade
+
+from app import create_app, count_new_show
+from directory import refresh_directory
+from models import db, Venue, Artist, Show
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+@pytest.fixture
+def app():
+    # the testing config: a fresh in-memory SQLite database migrated for
+    # each test, query budgets enforced
+    app = create_app('testing')
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def queries(response):
+    # statements the view ran, from its Server-Timing header
+    return int(QUERIES.search(response.headers['Server-Timing']).group(1))
+
+
+def add_venue(name='The Blue Room', city='San Francisco', state='CA', **fields):
+    venue = Venue(name=name, city=city, state=state, address='1 Main St',
+                  genres='Jazz', **fields)
+    db.session.add(venue)
+    db.session.commit()
+    return venue
+
+
+def add_artist(name='The Wild Echoes', city='San Francisco', state='CA', **fields):
+    artist = Artist(name=name, city=city, state=state, genres='Jazz', **fields)
+    db.session.add(artist)
+    db.session.commit()
+    return artist
+
+
+def add_show(venue, artist, start_time, hours=2):
+    show = Show(venue_id=venue.id, artist_id=artist.id, start_time=start_time,
+                end_time=start_time + timedelta(hours=hours))
+    db.session.add(show)
+    count_new_show(show)
+    db.session.commit()
+    return show
+
+
+def refresh():
+    # rebuild the /venues read model after writing rows directly
+    refresh_directory(db.session)
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from models import db
+
+from tests.conftest import add_venue, add_artist, add_show, queries
+
+
+def revalidate(client, path, response):
+    return client.get(path, headers={'If-None-Match': response.headers['ETag']})
+
+
+def test_artists_list_revalidated_from_table_version(app, client):
+    artist = add_artist('The Wild Echoes')
+    first = client.get('/api/v1/artists')
+
+    again = revalidate(client, '/api/v1/artists', first)
+    assert again.status_code == 304
+    assert queries(again) == 1
+
+    artist.name = 'The Quiet Owls'
+    db.session.commit()
+    renamed = revalidate(client, '/api/v1/artists', first)
+    assert renamed.status_code == 200
+    assert b'The Quiet Owls' in renamed.data
+
+
+def test_shows_list_changes_with_venue_name(app, client):
+    venue, artist = add_venue('The Blue Room'), add_artist()
+    add_show(venue, artist, datetime(2035, 4, 1, 20, 0))
+    first = client.get('/api/v1/shows')
+    assert revalidate(client, '/api/v1/shows', first).status_code == 304
+
+    venue.name = 'The Golden Hall'
+    db.session.commit()
+    renamed = revalidate(client, '/api/v1/shows', first)
+    assert renamed.status_code == 200
+    assert b'The Golden Hall' in renamed.data
+
+
+def test_etag_depends_on_query_string(app, client):
+    add_artist()
+    first = client.get('/api/v1/artists')
+    other = revalidate(client, '/api/v1/artists?fields=id', first)
+    assert other.status_code == 200
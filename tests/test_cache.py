@@ -0,0 +1,24 @@
+import logging
+
+from cache import StatsLogger
+
+from tests.conftest import add_venue
+
+
+def test_cache_stats_logged(app, client, caplog):
+    stats_logger, = [hook for hook in app.after_request_funcs[None]
+                     if isinstance(hook, StatsLogger)]
+    venue = add_venue()
+    client.get(f'/venues/{venue.id}')
+
+    caplog.set_level(logging.INFO, logger=app.logger.getChild('cache').name)
+    stats_logger.due = 0
+    client.get(f'/venues/{venue.id}')
+    client.get(f'/venues/{venue.id}')
+
+    # once per interval, with the counters as of the request that crossed it
+    records = [record for record in caplog.records if record.getMessage() == 'cache stats']
+    assert len(records) == 1
+    detail = records[0].caches['detail']
+    assert (detail['backend'], detail['hits'], detail['misses']) == ('memory', 1, 1)
+    assert 'fragment' in records[0].caches
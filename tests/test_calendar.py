@@ -0,0 +1,38 @@
+from datetime import datetime, timezone
+
+from app import local_datetime
+
+from tests.conftest import add_venue, add_artist, add_show
+
+
+def calendar(client, venue, start, end):
+    response = client.get(f'/api/v1/venues/{venue.id}/calendar',
+                          query_string={'from': start, 'to': end})
+    assert response.status_code == 200
+    return {day['start']: [show['id'] for show in day['shows']]
+            for day in response.get_json()['data']}
+
+
+def test_calendar_lists_shows_running_into_the_range(app, client):
+    venue, artist = add_venue(), add_artist()
+    late = add_show(venue, artist, datetime(2035, 3, 31, 23, 0), hours=3)
+    next_day = add_show(venue, artist, datetime(2035, 4, 2, 20, 0))
+
+    days = calendar(client, venue, '2035-04-01', '2035-04-04')
+
+    assert list(days.values()) == [[late.id], [next_day.id], []]
+
+
+def test_calendar_show_spanning_midnight_fills_both_days(app, client):
+    venue, artist = add_venue(), add_artist()
+    late = add_show(venue, artist, datetime(2035, 4, 1, 23, 0), hours=3)
+
+    days = calendar(client, venue, '2035-04-01', '2035-04-03')
+
+    assert list(days.values()) == [[late.id], [late.id]]
+
+
+def test_aware_datetimes_converted_to_local_time():
+    aware = datetime(2035, 4, 1, 12, 0, tzinfo=timezone.utc)
+    assert local_datetime(aware.isoformat()) == aware.astimezone().replace(tzinfo=None)
+    assert local_datetime('2035-04-01T12:00:00') == datetime(2035, 4, 1, 12, 0)
@@ -0,0 +1,105 @@
+import re
+from datetime import datetime, timedelta
+
+from app import show_venue, show_artist
+
+from tests.conftest import add_venue, add_artist, add_show, queries
+
+
+def split_shows(html):
+    # (upcoming, past) halves of a detail page, from their headings
+    text = html.decode('utf-8')
+    upcoming = re.search(r'(\d+) Upcoming\s+Shows?', text)
+    past = re.search(r'(\d+) Past\s+Shows?', text)
+    return text[upcoming.end():past.start()], text[past.end():], \
+        int(upcoming.group(1)), int(past.group(1))
+
+
+def booked():
+    # a venue with two past shows and one upcoming, by two artists; the
+    # artist of the past ones also has an upcoming show elsewhere
+    now = datetime.now()
+    venue = add_venue('The Blue Room')
+    other_venue = add_venue('The Golden Hall')
+    artist = add_artist('The Wild Echoes')
+    other_artist = add_artist('The Quiet Owls')
+    add_show(venue, artist, now - timedelta(days=30))
+    add_show(venue, artist, now - timedelta(days=10))
+    add_show(venue, other_artist, now + timedelta(days=10))
+    add_show(other_venue, artist, now + timedelta(days=20))
+    return venue, artist
+
+
+def test_venue_page_splits_past_and_upcoming_shows(app, client):
+    venue, _ = booked()
+
+    response = client.get(f'/venues/{venue.id}')
+
+    assert response.status_code == 200
+    assert queries(response) <= show_venue.query_budget
+    upcoming, past, upcoming_count, past_count = split_shows(response.data)
+    assert (upcoming_count, past_count) == (1, 2)
+    assert 'The Quiet Owls' in upcoming and 'The Wild Echoes' not in upcoming
+    assert past.count('The Wild Echoes') == 2 and 'The Quiet Owls' not in past
+
+
+def test_artist_page_splits_past_and_upcoming_shows(app, client):
+    _, artist = booked()
+
+    response = client.get(f'/artists/{artist.id}')
+
+    assert response.status_code == 200
+    assert queries(response) <= show_artist.query_budget
+    upcoming, past, upcoming_count, past_count = split_shows(response.data)
+    assert (upcoming_count, past_count) == (1, 2)
+    assert 'The Golden Hall' in upcoming and 'The Blue Room' not in upcoming
+    assert past.count('The Blue Room') == 2 and 'The Golden Hall' not in past
+
+
+def test_detail_pages_cached_until_updated(app, client):
+    venue, artist = booked()
+
+    for path in (f'/venues/{venue.id}', f'/artists/{artist.id}'):
+        first = client.get(path)
+        again = client.get(path)
+        assert again.data == first.data
+        # only the updated_at lookup once the page data is cached
+        assert queries(again) == 1
+
+
+def test_new_show_refreshes_cached_pages(app, client):
+    venue, artist = booked()
+    client.get(f'/venues/{venue.id}')
+    client.get(f'/artists/{artist.id}')
+
+    add_show(venue, artist, datetime.now() + timedelta(days=40))
+
+    _, _, upcoming_count, _ = split_shows(client.get(f'/venues/{venue.id}').data)
+    assert upcoming_count == 2
+    _, _, upcoming_count, _ = split_shows(client.get(f'/artists/{artist.id}').data)
+    assert upcoming_count == 2
+
+
+def test_detail_page_queries_do_not_grow_with_shows(app, client):
+    now = datetime.now()
+    few_venue = add_venue('The Blue Room')
+    few_artist = add_artist('The Wild Echoes')
+    add_show(few_venue, few_artist, now + timedelta(days=1))
+
+    # a venue and an artist with many shows, past and upcoming, each with
+    # its own counterpart; fresh records, so neither page is cached yet
+    many_venue = add_venue('The Golden Hall')
+    many_artist = add_artist('The Quiet Owls')
+    for number in range(-10, 10):
+        start = now + timedelta(days=number, hours=1)
+        add_show(many_venue, add_artist(f'The Loud Crows {number}'), start)
+        add_show(add_venue(f'The Red Barn {number}'), many_artist, start)
+
+    for kind, few, many in (('venues', few_venue, many_venue),
+                            ('artists', few_artist, many_artist)):
+        few_queries = queries(client.get(f'/{kind}/{few.id}'))
+        response = client.get(f'/{kind}/{many.id}')
+        assert response.status_code == 200
+        _, _, upcoming_count, past_count = split_shows(response.data)
+        assert upcoming_count + past_count == 20
+        assert queries(response) == few_queries
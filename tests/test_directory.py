@@ -0,0 +1,32 @@
+import directory
+from models import Venue
+
+from tests.conftest import add_venue, refresh
+
+VENUE_FORM = {
+    'name': 'The Blue Room', 'city': 'San Francisco', 'state': 'CA',
+    'address': '1 Main St', 'phone': '415-000-0000', 'genres': ['Jazz'],
+    'facebook_link': 'https://www.facebook.com/theblueroom', 'image_link': '',
+    'website_link': '', 'seeking_description': '',
+}
+
+
+def test_new_venue_listed_in_directory(app, client):
+    add_venue('The Golden Hall')
+    refresh()
+
+    client.post('/venues/create', data=VENUE_FORM)
+
+    assert b'The Blue Room' in client.get('/venues').data
+
+
+def test_failed_refresh_does_not_fail_the_write(app, client, monkeypatch):
+    def broken(session, wait=False):
+        raise RuntimeError('refresh failed')
+    monkeypatch.setattr(directory, 'refresh_directory', broken)
+
+    response = client.post('/venues/create', data=VENUE_FORM, follow_redirects=True)
+
+    assert Venue.query.filter_by(name='The Blue Room').count() == 1
+    assert b'was successfully listed' in response.data
+    assert b'could not be listed' not in response.data
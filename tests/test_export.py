@@ -0,0 +1,43 @@
+import json
+from datetime import datetime, timedelta
+
+from tests.conftest import add_venue
+from models import db, Venue
+
+
+def exported(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_export_after_id(app, client):
+    venues = [add_venue(f'The Blue Room {number}') for number in range(3)]
+
+    rows = exported(client, f'/export/venues?after_id={venues[0].id}')
+    assert [row['id'] for row in rows] == [venue.id for venue in venues[1:]]
+
+
+def test_export_since(app, client):
+    venues = [add_venue(f'The Blue Room {number}') for number in range(4)]
+    start = datetime(2035, 4, 1, 20, 0)
+    times = [start, start + timedelta(hours=1), start + timedelta(hours=1), start - timedelta(days=1)]
+    for venue, updated_at in zip(venues, times):
+        db.session.query(Venue).filter(Venue.id == venue.id).update(
+            {'updated_at': updated_at}, synchronize_session=False)
+    db.session.commit()
+
+    # changed at or after since=, oldest change first
+    rows = exported(client, '/export/venues?since=2035-04-01T20:00:00')
+    assert [row['id'] for row in rows] == [venue.id for venue in venues[:3]]
+    assert rows[0]['updated_at'] == '2035-04-01T20:00:00'
+
+    # an offset is converted to UTC
+    rows = exported(client, '/export/venues?since=2035-04-01T22:30:00%2B02:00')
+    assert [row['id'] for row in rows] == [venue.id for venue in venues[1:3]]
+
+    # after_id resumes within rows changed at the same time
+    rows = exported(client, f'/export/venues?since=2035-04-01T21:00:00&after_id={venues[1].id}')
+    assert [row['id'] for row in rows] == [venues[2].id]
+
+    assert client.get('/export/venues?since=yesterday').status_code == 400
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from fragments import AtomicBytecodeCache, fragment_key
+from models import db, Artist
+
+from tests.conftest import add_venue, add_artist, refresh
+
+
+def test_fragment_keys_do_not_collide():
+    assert fragment_key('t.html', 3, ('a:b', 'c')) != fragment_key('t.html', 3, ('a', 'b:c'))
+    assert fragment_key('t.html', 3, (1,)) != fragment_key('t.html', 3, ('1',))
+    assert fragment_key('t.html', 3, 'a') != fragment_key('t.html', 4, 'a')
+
+
+def test_fragment_key_stable():
+    start = datetime(2035, 4, 1, 20, 0)
+    assert fragment_key('t.html', 3, ['show', 1, start]) == fragment_key('t.html', 3, ('show', 1, start))
+
+
+def test_listing_tiles_cached_until_listing_changes(app, client):
+    fragments = app.jinja_env.fragment_cache
+    add_venue('The Blue Room')
+    add_artist('The Wild Echoes')
+    refresh()
+
+    for path in ('/venues', '/artists'):
+        first = client.get(path).data
+        hits = fragments.hits
+        assert client.get(path).data == first
+        assert fragments.hits == hits + 1
+
+    # a rebuilt directory and an edited artist render fresh
+    add_venue('The Golden Hall')
+    refresh()
+    assert b'The Golden Hall' in client.get('/venues').data
+    db.session.query(Artist).update({'name': 'The Quiet Owls'}, synchronize_session=False)
+    db.session.commit()
+    assert b'The Quiet Owls' in client.get('/artists').data
+
+
+def test_bytecode_cache_written_atomically(app, tmp_path):
+    cache = AtomicBytecodeCache(str(tmp_path))
+    bucket = cache.get_bucket(app.jinja_env, 'pages/venues.html', None, 'x = 1')
+    bucket.code = compile('x = 1', 'pages/venues.html', 'exec')
+
+    cache.dump_bytecode(bucket)
+    cache.dump_bytecode(bucket)
+
+    # one complete file, no temporaries left behind
+    assert [path.name for path in tmp_path.iterdir()] == [cache.pattern % bucket.key]
+    loaded = cache.get_bucket(app.jinja_env, 'pages/venues.html', None, 'x = 1')
+    assert loaded.code == bucket.code
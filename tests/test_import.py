@@ -0,0 +1,31 @@
+import json
+from datetime import datetime
+
+from app import import_command
+from models import Show
+
+from tests.conftest import add_venue, add_artist, add_show
+
+
+def test_import_rejects_overlapping_shows(app, tmp_path):
+    venue, other_venue, artist = add_venue(), add_venue('The Golden Hall'), add_artist()
+    add_show(venue, artist, datetime(2035, 4, 1, 20, 0))
+    rows = [
+        # overlaps the show already booked
+        {'venue_id': venue.id, 'artist_id': artist.id, 'start_time': '2035-04-01 21:00:00'},
+        {'venue_id': venue.id, 'artist_id': artist.id, 'start_time': '2035-04-02 20:00:00'},
+        # overlaps the row above
+        {'venue_id': venue.id, 'artist_id': artist.id, 'start_time': '2035-04-02 22:00:00'},
+        {'venue_id': other_venue.id, 'artist_id': artist.id, 'start_time': '2035-04-02 22:00:00'},
+    ]
+    path = tmp_path / 'shows.jsonl'
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    rejects = tmp_path / 'rejects.jsonl'
+
+    result = app.test_cli_runner().invoke(
+        import_command, ['shows', str(path), '--rejects', str(rejects)])
+
+    assert result.exit_code == 0, result.output
+    assert '2 shows imported, 2 rejected' in result.output
+    assert [json.loads(line)['line'] for line in rejects.read_text().splitlines()] == [1, 3]
+    assert Show.query.count() == 3
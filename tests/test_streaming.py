@@ -0,0 +1,28 @@
+import pytest
+
+from app import artists
+from profiling import QueryBudgetExceeded
+
+from tests.conftest import add_artist
+
+
+def test_streamed_page_within_budget(app, client):
+    for number in range(5):
+        add_artist(f'The Wild Echoes {number}')
+
+    response = client.get('/artists')
+
+    # the rows are fetched while the body is sent, after the headers; the
+    # budget is checked (strictly, in testing) once it has been read
+    assert 'db;' not in response.headers['Server-Timing']
+    assert response.get_data(as_text=True).count('The Wild Echoes') == 5
+
+
+def test_streamed_page_queries_counted(app, client, monkeypatch):
+    add_artist()
+    monkeypatch.setattr(artists, 'query_budget', 0)
+
+    response = client.get('/artists')
+
+    with pytest.raises(QueryBudgetExceeded):
+        response.get_data()
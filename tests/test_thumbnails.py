@@ -0,0 +1,126 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+
+PIL = pytest.importorskip('PIL')
+from PIL import Image
+
+from tests.conftest import add_venue
+from thumbnails import ThumbnailCache, ThumbnailError
+
+
+def png(width, height, color):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+IMAGES = {
+    '/wide.png': png(800, 400, 'red'),
+    '/tall.png': png(300, 600, 'blue'),
+}
+
+
+@pytest.fixture
+def source():
+    # a local image server; .requests lists every path fetched from it
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            body = IMAGES.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.requests = requests
+    server.url = 'http://127.0.0.1:%d' % server.server_port
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(app, tmp_path):
+    # a cache of our own, so tests never share instance/test-thumbnails
+    cache = ThumbnailCache(str(tmp_path), app.config['THUMBNAIL_CACHE_BYTES'],
+                           allow_private=app.config['THUMBNAIL_ALLOW_PRIVATE'])
+    app.extensions['thumbnail_cache'] = cache
+    return cache
+
+
+def test_thumbnail_resized_and_negotiated(app, client, cache, source):
+    venue = add_venue(image_link=source.url + '/wide.png')
+    url = f'/img/venues/{venue.id}/sm'
+
+    response = client.get(url, headers={'Accept': 'image/webp,*/*'})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/webp'
+    assert 'Accept' in response.vary
+    with Image.open(BytesIO(response.data)) as image:
+        assert image.format == 'WEBP'
+        assert image.size == (app.config['THUMBNAIL_SIZES']['sm'], 80)
+
+    response = client.get(url, headers={'Accept': 'image/png,image/jpeg'})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    with Image.open(BytesIO(response.data)) as image:
+        assert image.format == 'JPEG'
+        assert image.size == (160, 80)
+
+
+def test_thumbnail_cached(client, cache, source):
+    venue = add_venue(image_link=source.url + '/wide.png')
+    url = f'/img/venues/{venue.id}/md'
+
+    first = client.get(url)
+    second = client.get(url)
+    assert first.status_code == second.status_code == 200
+    assert first.data == second.data
+    # one fetch of the source, for both requests
+    assert source.requests == ['/wide.png']
+
+
+def test_thumbnail_cache_evicts_least_recently_used(cache, source):
+    wide = cache.thumbnail(source.url + '/wide.png', 160, 'jpeg')
+    tall = cache.thumbnail(source.url + '/tall.png', 160, 'jpeg')
+    # leave only the two thumbnails, wide written first
+    for entry in os.scandir(cache.directory):
+        if entry.name.endswith('.source'):
+            os.remove(entry.path)
+    os.utime(wide, (1000, 1000))
+    os.utime(tall, (2000, 2000))
+
+    # a hit makes wide the most recently used
+    assert cache.thumbnail(source.url + '/wide.png', 160, 'jpeg') == wide
+    cache.max_bytes = os.path.getsize(wide) + os.path.getsize(tall) - 1
+    cache._evict()
+
+    assert os.path.exists(wide)
+    assert not os.path.exists(tall)
+
+
+def test_thumbnail_refuses_private_address(app, client, tmp_path, source):
+    cache = ThumbnailCache(str(tmp_path), app.config['THUMBNAIL_CACHE_BYTES'])
+    with pytest.raises(ThumbnailError):
+        cache.thumbnail(source.url + '/wide.png', 160, 'jpeg')
+
+    app.extensions['thumbnail_cache'] = cache
+    venue = add_venue(image_link=source.url + '/wide.png')
+    assert client.get(f'/img/venues/{venue.id}/sm').status_code == 404
+    assert source.requests == []
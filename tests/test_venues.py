@@ -0,0 +1,55 @@
+from app import venues
+
+from tests.conftest import add_venue, queries, refresh
+
+
+def test_venues_within_query_budget(app, client):
+    for number in range(3):
+        add_venue(f'The Blue Room {number}')
+    refresh()
+
+    response = client.get('/venues')
+
+    assert response.status_code == 200
+    assert queries(response) <= venues.query_budget
+
+
+def test_venues_queries_do_not_grow_with_venues(app, client):
+    add_venue('The Blue Room')
+    refresh()
+    few = queries(client.get('/venues'))
+
+    for number in range(30):
+        add_venue(f'The Golden Hall {number}', city=f'Springfield {number % 7}')
+    refresh()
+    response = client.get('/venues')
+
+    assert response.status_code == 200
+    assert b'The Golden Hall 29' in response.data
+    assert queries(response) == few
+
+
+def test_search_limit_bounded(app, client):
+    for number in range(3):
+        add_venue(f'The Blue Room {number}')
+
+    assert client.get('/api/v1/venues/search?q=blue&limit=0').status_code == 400
+    response = client.get('/api/v1/venues/search?q=blue&limit=100000')
+    assert response.status_code == 200
+    assert response.get_json()['count'] == 3
+
+
+def test_api_list_revalidated_without_listing(app, client):
+    add_venue('The Blue Room')
+    refresh()
+    first = client.get('/api/v1/venues')
+
+    again = client.get('/api/v1/venues', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert queries(again) == 1
+
+    add_venue('The Golden Hall')
+    refresh()
+    changed = client.get('/api/v1/venues', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert b'The Golden Hall' in changed.data
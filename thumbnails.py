@@ -0,0 +1,210 @@
+#----------------------------------------------------------------------------#
+# Resized image_link thumbnails with a bounded on-disk cache.
+#----------------------------------------------------------------------------#
+
+import hashlib
+import http.client
+import importlib.util
+import ipaddress
+import os
+import socket
+import tempfile
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from io import BytesIO
+
+# Pillow is optional (without it pages link the source images directly)
+# and is only imported once the first thumbnail is made
+PILLOW_INSTALLED = importlib.util.find_spec('PIL') is not None
+
+# decoded size limit; Pillow's own check (MAX_IMAGE_PIXELS) is set to it too
+MAX_SOURCE_PIXELS = 40_000_000
+
+
+class ThumbnailError(Exception):
+    """The source image could not be fetched or decoded."""
+
+
+#----------------------------------------------------------------------------#
+# Fetching sources.
+#
+# image_link is user input, so sources are only fetched from public
+# addresses: every connection, the first and each redirect's, resolves the
+# host, refuses loopback, private, link-local (cloud metadata) and other
+# non-global addresses, and connects to the address it checked. Proxies
+# from the environment are not used, since they would hide the target.
+# allow_private (THUMBNAIL_ALLOW_PRIVATE) lifts the address check, for
+# tests against a local server; never in production.
+#----------------------------------------------------------------------------#
+
+MAX_REDIRECTS = 3
+
+
+def public_address(address):
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def public_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    # socket.create_connection for public addresses only
+    host, port = address
+    checked = []
+    for *_, sockaddr in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM):
+        if not public_address(sockaddr[0]):
+            raise OSError(f'{host} resolves to non-public address {sockaddr[0]}')
+        checked.append(sockaddr[0])
+    error = OSError(f'{host} does not resolve')
+    for ip in checked:
+        try:
+            return socket.create_connection((ip, port), timeout, source_address)
+        except OSError as e:
+            error = e
+    raise error
+
+
+class PublicHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = public_connection
+
+
+class PublicHTTPSConnection(http.client.HTTPSConnection):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = public_connection
+
+
+class PublicHTTPHandler(urllib.request.HTTPHandler):
+
+    def http_open(self, req):
+        return self.do_open(PublicHTTPConnection, req)
+
+
+class PublicHTTPSHandler(urllib.request.HTTPSHandler):
+
+    def https_open(self, req):
+        return self.do_open(PublicHTTPSConnection, req, context=self._context)
+
+
+class RedirectHandler(urllib.request.HTTPRedirectHandler):
+    max_redirections = MAX_REDIRECTS
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if urllib.parse.urlsplit(newurl).scheme not in ('http', 'https'):
+            raise urllib.error.HTTPError(newurl, code, f'redirect to {newurl!r} refused',
+                                         headers, fp)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+def source_opener(allow_private=False):
+    handlers = (urllib.request.HTTPHandler, urllib.request.HTTPSHandler) if allow_private \
+        else (PublicHTTPHandler, PublicHTTPSHandler)
+    return urllib.request.build_opener(urllib.request.ProxyHandler({}), *handlers, RedirectHandler)
+
+
+#----------------------------------------------------------------------------#
+# Thumbnails.
+#----------------------------------------------------------------------------#
+
+
+class ThumbnailCache:
+    """Thumbnails of remote images, stored under `directory`.
+
+    Each source is downloaded once and kept next to its resized variants.
+    Files are evicted least recently used first (reads refresh the file's
+    mtime) once the directory grows past `max_bytes`.
+    """
+
+    def __init__(self, directory, max_bytes, timeout=10, max_source_bytes=20 * 1024 * 1024,
+                 allow_private=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_source_bytes = max_source_bytes
+        self._opener = source_opener(allow_private)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def available(self):
+        return PILLOW_INSTALLED
+
+    def thumbnail(self, source_url, width, format):
+        """Path of the `format` ('webp' or 'jpeg') thumbnail `width` px wide."""
+        key = hashlib.sha256(source_url.encode('utf-8')).hexdigest()
+        path = os.path.join(self.directory, f'{key}.{width}.{format}')
+        if self._touch(path):
+            return path
+
+        from PIL import Image
+        Image.MAX_IMAGE_PIXELS = MAX_SOURCE_PIXELS
+        try:
+            with Image.open(self._source(key, source_url)) as image:
+                # open() only reads the header; refuse before decoding
+                if image.width * image.height > MAX_SOURCE_PIXELS:
+                    raise ThumbnailError(f'{source_url} is larger than {MAX_SOURCE_PIXELS} pixels')
+                image = image.convert('RGB')
+                if image.width > width:
+                    image.thumbnail((width, width * image.height // image.width))
+                buffer = BytesIO()
+                image.save(buffer, format.upper(), quality=80)
+        except (OSError, ValueError, Image.DecompressionBombError) as error:
+            raise ThumbnailError(str(error))
+
+        self._write(path, buffer.getvalue())
+        return path
+
+    def _source(self, key, url):
+        path = os.path.join(self.directory, f'{key}.source')
+        if self._touch(path):
+            return path
+        if not url.startswith(('http://', 'https://')):
+            raise ThumbnailError(f'unsupported image url {url!r}')
+        try:
+            with self._opener.open(url, timeout=self.timeout) as response:
+                data = response.read(self.max_source_bytes + 1)
+        except OSError as error:
+            raise ThumbnailError(str(error))
+        if len(data) > self.max_source_bytes:
+            raise ThumbnailError(f'{url} is larger than {self.max_source_bytes} bytes')
+        self._write(path, data)
+        return path
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _write(self, path, data):
+        # write-then-rename so concurrent readers never see partial files
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size